@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+# Compares the streaming TerminalFilter against the regex based cleaning it replaced, on colourised output
+# like ``ls --color`` over a large tree or ``systemctl status``.
+import argparse
+import re
+import time
+from redexpect import terminal
+
+
+def regex_clean(string):
+    string = string.replace('\r','')
+    return(re.sub(r'\x1b\[([0-9,A-Z]{1,2}(;[0-9]{1,2})?(;[0-9]{3})?)?[m|K]?','',string))
+
+def filter_clean(terminal_filter,string):
+    return(terminal_filter.feed(string))
+
+
+def ls_color(size):
+    line = '\x1b[0m\x1b[01;34mdirectory\x1b[0m  \x1b[01;32mscript.sh\x1b[0m  \x1b[01;36mlink\x1b[0m  file.txt  \x1b[40;31;01mbroken\x1b[0m\r\n'
+    return(line*(size//len(line)))
+
+def systemctl_status(size):
+    block = '\x1b[0;1;32m●\x1b[0m ssh.service - OpenBSD Secure Shell server\r\n' \
+        '     Loaded: loaded (/lib/systemd/system/ssh.service; \x1b[0;1;32menabled\x1b[0m)\r\n' \
+        '     Active: \x1b[0;1;32mactive (running)\x1b[0m since Mon 2020-01-06 10:00:00 UTC\r\n' \
+        'Jan 06 10:00:00 host sshd[1234]: Accepted publickey for user from 10.0.0.1\r\n'
+    return(block*(size//len(block)))
+
+def plain(size):
+    line = 'drwxr-xr-x  2 root root 4096 Jan  6 10:00 directory\r\n'
+    return(line*(size//len(line)))
+
+
+def chunked(data,chunk_size):
+    return([data[pos:pos+chunk_size] for pos in range(0,len(data),chunk_size)])
+
+def run(chunks,clean):
+    started = time.time()
+    for chunk in chunks:
+        clean(chunk)
+    return(time.time()-started)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--size',default=20,type=float,help='Output size in MB.')
+    parser.add_argument('--chunk-size',default=32768,type=int)
+    args = parser.parse_args()
+    size = int(args.size*1024*1024)
+
+    print('output,cleaner,seconds,mb_per_second')
+    for generator in [ls_color,systemctl_status,plain]:
+        chunks = chunked(generator(size),args.chunk_size)
+        terminal_filter = terminal.TerminalFilter()
+        for (name,clean) in [('regex',regex_clean),('filter',lambda chunk:filter_clean(terminal_filter,chunk))]:
+            seconds = run(chunks,clean)
+            print('{},{},{:.3f},{:.1f}'.format(generator.__name__,name,seconds,args.size/seconds))
+
+
+if __name__=='__main__':
+    main()
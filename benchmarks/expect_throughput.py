@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+# Measures how fast RedExpect.expect() gets through large outputs before the prompt shows up.
+# Throughput should stay flat as the output grows, run with --full-history to compare against
+# searching the entire output on every read.
+import argparse
+import time
+import redexpect
+
+
+class FeedExpect(redexpect.RedExpect):
+    def __init__(self,chunks,**kwargs):
+        super().__init__(**kwargs)
+        self.chunks = iter(chunks)
+
+    def read(self,block=False):
+        for chunk in self.chunks:
+            yield(chunk)
+
+
+def generate_chunks(size,chunk_size,prompt):
+    line = b'kernel: [    0.000000] Linux version 5.10.0-0.bpo.9-amd64 (debian-kernel@lists.debian.org)\r\n'
+    chunk = (line*((chunk_size//len(line))+1))[:chunk_size]
+    sent = 0
+    while sent<size:
+        yield(chunk)
+        sent+=len(chunk)
+    yield(prompt)
+
+
+def run(size,chunk_size,full_history):
+    expect = FeedExpect(generate_chunks(size,chunk_size,b'\r\nswitch01# '),expect_timeout=0)
+    started = time.time()
+    expect.expect(r'switch01\#\s+',full_history=full_history)
+    return(time.time()-started)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes',default='1,5,10,25,50',help='Output sizes to expect through, in MB.')
+    parser.add_argument('--chunk-size',default=32768,type=int)
+    parser.add_argument('--full-history',action='store_true')
+    args = parser.parse_args()
+
+    print('size_mb,seconds,mb_per_second')
+    for size_mb in [float(size) for size in args.sizes.split(',')]:
+        seconds = run(int(size_mb*1024*1024),args.chunk_size,args.full_history)
+        print('{},{:.3f},{:.1f}'.format(size_mb,seconds,size_mb/seconds))
+
+
+if __name__=='__main__':
+    main()
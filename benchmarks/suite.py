@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+# Runs recorded sessions through RedExpect as fast as they can be played back and compares the results against the
+# baselines in baselines.json, exiting with 1 if anything got slower or bigger than --tolerance allows.
+# Each scenario runs in its own process so its peak RSS isn't inflated by the ones before it.
+# Baselines are only comparable on the machine they were saved on, re-save them with --save after changing machines.
+import argparse
+import json
+import os
+import sys
+import time
+import resource
+import multiprocessing
+import redexpect
+
+PROMPT = b'bench$ '
+BASELINES = os.path.join(os.path.dirname(os.path.abspath(__file__)),'baselines.json')
+
+
+def command_recording(outputs,chunk_size):
+    recording = [(0.0,'received',PROMPT)]
+    for (cmd,output) in outputs:
+        recording.append((0.0,'sent',cmd+b'\r'))
+        data = cmd+b'\r\n'+output+b'\r\n'+PROMPT
+        recording += [(0.0,'received',data[pos:pos+chunk_size]) for pos in range(0,len(data),chunk_size)]
+    return(recording)
+
+def repeated(line,size):
+    return(line*(size//len(line)))
+
+
+def large_output(scale):
+    size = int(20*scale*1024*1024)
+    line = b'kernel: [    0.000000] Linux version 5.10.0-0.bpo.9-amd64 (debian-kernel@lists.debian.org)\r\n'
+    return(command_recording([(b'dmesg',repeated(line,size))],32768),['dmesg'],size)
+
+def many_small_commands(scale):
+    count = int(20000*scale)
+    outputs = [('echo '+str(index)).encode('utf8') for index in range(count)]
+    return(command_recording([(output,output[5:]) for output in outputs],32768),[output.decode('utf8') for output in outputs],0)
+
+def ansi_heavy(scale):
+    size = int(10*scale*1024*1024)
+    line = b'\x1b[0m\x1b[01;34mdirectory\x1b[0m  \x1b[01;32mscript.sh\x1b[0m  \x1b[01;36mlink\x1b[0m  \x1b]8;;file:///tmp\x07file.txt\x1b]8;;\x07\r\n'
+    return(command_recording([(b'ls --color',repeated(line,size))],4096),['ls --color'],size)
+
+def drip_feed(scale):
+    size = int(1*scale*1024*1024)
+    line = b'Jan 06 10:00:00 host sshd[1234]: Accepted publickey for user from 10.0.0.1\r\n'
+    return(command_recording([(b'tail -f',repeated(line,size))],64),['tail -f'],size)
+
+SCENARIOS = [large_output,many_small_commands,ansi_heavy,drip_feed]
+
+
+def run(scenario,scale,queue):
+    (recording,cmds,size) = scenario(scale)
+    rs = redexpect.TransportSession(redexpect.ReplayTransport(recording,eof=False),prompt=r'bench\$ ',expect_timeout=0)
+    rs.prompt()
+    started = time.perf_counter()
+    for cmd in cmds:
+        rs.command(cmd)
+    seconds = time.perf_counter()-started
+    result = {'peak_rss_mb':resource.getrusage(resource.RUSAGE_SELF).ru_maxrss/1024.0}
+    if size==0:
+        result['commands_per_second'] = len(cmds)/seconds
+    else:
+        result['mb_per_second'] = size/1024.0/1024.0/seconds
+    queue.put(result)
+
+def run_isolated(scenario,scale):
+    queue = multiprocessing.Queue()
+    process = multiprocessing.Process(target=run,args=(scenario,scale,queue))
+    process.start()
+    result = queue.get()
+    process.join()
+    return(result)
+
+def regressed(metric,value,baseline,tolerance):
+    # Throughput is better higher, memory is better lower.
+    if metric=='peak_rss_mb':
+        return(value>baseline*(1+tolerance))
+    return(value<baseline*(1-tolerance))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--scale',default=1.0,type=float,help='Multiplier for the size of every scenario.')
+    parser.add_argument('--repeat',default=3,type=int,help='Runs of each scenario, the best result of each metric is kept.')
+    parser.add_argument('--tolerance',default=0.25,type=float,help='Fraction a metric may be worse than its baseline by.')
+    parser.add_argument('--baselines',default=BASELINES)
+    parser.add_argument('--save',action='store_true',help='Save the results as the new baselines.')
+    args = parser.parse_args()
+
+    baselines = {}
+    if os.path.exists(args.baselines):
+        with open(args.baselines) as baselines_file:
+            baselines = json.load(baselines_file)
+
+    results = {}
+    failed = False
+    print('scenario,metric,value,baseline,change')
+    for scenario in SCENARIOS:
+        runs = [run_isolated(scenario,args.scale) for _ in range(args.repeat)]
+        result = {}
+        for metric in runs[0]:
+            if metric=='peak_rss_mb':
+                result[metric] = min([run[metric] for run in runs])
+            else:
+                result[metric] = max([run[metric] for run in runs])
+        results[scenario.__name__] = dict([(metric,round(value,1)) for (metric,value) in result.items()])
+        for (metric,value) in sorted(result.items()):
+            baseline = baselines.get(scenario.__name__,{}).get(metric)
+            if baseline==None:
+                print('{},{},{:.1f},,'.format(scenario.__name__,metric,value))
+                continue
+            change = ''
+            if regressed(metric,value,baseline,args.tolerance):
+                change = ' REGRESSED'
+                failed = True
+            print('{},{},{:.1f},{:.1f},{:+.1%}{}'.format(scenario.__name__,metric,value,baseline,(value-baseline)/baseline,change))
+
+    if args.save==True:
+        with open(args.baselines,'w') as baselines_file:
+            json.dump(results,baselines_file,indent=4,sort_keys=True)
+            baselines_file.write('\n')
+    elif failed==True:
+        sys.exit(1)
+
+
+if __name__=='__main__':
+    main()
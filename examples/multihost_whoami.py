@@ -11,12 +11,13 @@ def main():
         'etc'
     ]
 
-    for hostname in hostnames:
-        expect = redexpect.RedExpect()
-        print(hostname)
-        expect.login(hostname=hostname,username=username,password=passwd,timeout=1.5)
-        print(expect.command('whoami',remove_newline=True))
-        expect.exit() # it is polite to properly exit the session, but you don't have to.
+    fleet = redexpect.Fleet(hostnames,max_workers=16,host_timeout=30,login_kwargs={'username':username,'password':passwd})
+    for host_result in fleet.command('whoami',remove_newline=True): # sessions are exited for you once done
+        if host_result.ok==True:
+            print(host_result.host+': '+host_result.result)
+        else:
+            print(host_result.host+': failed with '+repr(host_result.error))
+    print(fleet.stats.as_dict())
 
 
 if __name__=='__main__':
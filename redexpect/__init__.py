@@ -29,3 +29,24 @@ VERSION = u'2.0.3-3'
 from redexpect.redexpect import RedExpect
 from redexpect.redexpect import exceptions
 
+from redexpect.patterns import PatternSet
+from redexpect.spool import SpooledOutput
+from redexpect.result import CommandResult
+from redexpect.result import ExecResult
+from redexpect.fleet import Fleet
+from redexpect.pool import SessionPool
+from redexpect.promptcache import PromptCache
+from redexpect.metrics import Metrics
+from redexpect.metrics import StatsdMetrics
+from redexpect.metrics import PrometheusMetrics
+from redexpect.profiler import Profile
+from redexpect.sinks import BatchedSink
+from redexpect.sinks import SinkWriter
+from redexpect.engine import ExpectEngine
+from redexpect.session import ExpectSession
+from redexpect.transports import Transport
+from redexpect.transports import PtyTransport
+from redexpect.transports import ReplayTransport
+from redexpect.transports import TransportSession
+from redexpect.aio import AsyncRedExpect
+from redexpect.aio import AsyncTransportSession
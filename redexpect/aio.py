@@ -0,0 +1,203 @@
+# RedExpect
+# Copyright (C) 2018 - 2020  Red_M ( http://bitbucket.com/Red_M )
+
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+
+import asyncio
+import time
+import inspect
+import functools
+from redssh import libssh2
+
+from redexpect.redexpect import RedExpect
+from redexpect import metrics
+from redexpect import profiler
+from redexpect import session
+from redexpect import transports
+
+
+class AsyncExpectSession(session.ExpectSession):
+    '''
+    A :class:`redexpect.session.ExpectSession` where waiting on the remote end is done by the ``asyncio`` event loop
+    instead of by a thread sleeping on it, so one thread can drive thousands of sessions at once.
+
+    The functions that wait on the remote end return awaitables that must be awaited:
+    :func:`redexpect.RedExpect.start`, :func:`redexpect.RedExpect.expect`, :func:`redexpect.RedExpect.prompt`,
+    :func:`redexpect.RedExpect.command`, :func:`redexpect.RedExpect.command_batch`, :func:`redexpect.RedExpect.sudo`,
+    :func:`redexpect.RedExpect.disable_paging`, :func:`redexpect.RedExpect.disable_echo`,
+    :func:`redexpect.RedExpect.set_unique_prompt` and :func:`redexpect.RedExpect.get_unique_prompt`.
+    They run the same steps as the sync session, only waiting is left to the event loop.
+    Overrides of :func:`redexpect.aio.AsyncExpectSession.device_init` and :func:`redexpect.RedExpect.get_unique_prompt`
+    may be coroutines. Sending stays a normal function call.
+
+    Subclasses provide ``read_nowait()``, returning an iterable of what has been received so far that reads lazily,
+    so what isn't needed for a match is left to be read by the next expect, and
+    ``wait_fileno()``, returning ``tuple (int, bool)`` of a file descriptor to wait on and whether to wait for it to be writable as well.
+    '''
+
+    async def device_init(self,**kwargs):
+        '''
+        Same as :func:`redexpect.RedExpect.device_init`, but a coroutine.
+        '''
+        pass
+
+    async def _run(self,steps):
+        # Same as ExpectSession._run(), awaiting what the functions return when they are coroutines.
+        value = None
+        while True:
+            try:
+                step = steps.send(value)
+            except StopIteration as stop:
+                return(stop.value)
+            value = None
+            if step!=None:
+                value = step()
+                if inspect.isawaitable(value)==True:
+                    value = await value
+
+    def _reader(self):
+        return(self.read_nowait())
+
+    async def _wait(self,wait):
+        if self.profile==None:
+            return(await self.wait_for_data(wait))
+        started = time.perf_counter()
+        await self.wait_for_data(wait)
+        self.profile.add(('expect',profiler.WAIT),time.perf_counter()-started)
+
+    def command_stream(self,cmd,lines=False,timeout=None):
+        '''
+        Not supported on an ``asyncio`` session as it would have to wait on the remote end without the event loop,
+        use :func:`redexpect.RedExpect.command` with ``spool`` set to keep large output out of memory instead.
+
+        :raises: ``TypeError`` always.
+        '''
+        raise(TypeError('command_stream() can\'t be used with an asyncio session, use command(spool=...) instead'))
+
+    def read_nowait(self):
+        raise(NotImplementedError())
+
+    def wait_fileno(self):
+        raise(NotImplementedError())
+
+    async def wait_for_data(self,timeout):
+        '''
+        Same as :func:`redexpect.RedExpect.wait_for_data`, but a coroutine that lets the event loop watch the file descriptor.
+        '''
+        loop = asyncio.get_event_loop()
+        (fileno,writing) = self.wait_fileno()
+        if fileno==None:
+            await asyncio.sleep(timeout)
+            return
+        wake = loop.create_future()
+        def ready():
+            if wake.done()==False:
+                wake.set_result(None)
+        loop.add_reader(fileno,ready)
+        if writing==True:
+            loop.add_writer(fileno,ready)
+        try:
+            await asyncio.wait_for(wake,timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            loop.remove_reader(fileno)
+            if writing==True:
+                loop.remove_writer(fileno)
+
+
+class AsyncRedExpect(AsyncExpectSession,RedExpect):
+    '''
+    A :class:`redexpect.RedExpect` for use with ``asyncio``, see :class:`redexpect.aio.AsyncExpectSession` for which
+    functions are coroutines. This takes the same arguments as :class:`redexpect.RedExpect`.
+
+    Connecting and authenticating are done in the event loop's default executor, as libssh2's handshake blocks.
+    '''
+
+    async def login(self,*args,auto_unique_prompt=True,disable_paging=False,disable_echo=False,**kwargs):
+        '''
+        Same as :func:`redexpect.RedExpect.login`, but a coroutine.
+        '''
+        loop = asyncio.get_event_loop()
+        started = time.monotonic()
+        await loop.run_in_executor(None,functools.partial(self.connect,*args,**kwargs))
+        self.metrics.timing(metrics.CONNECT,time.monotonic()-started)
+        self._logged_in_as(args,kwargs)
+        await self.start(auto_unique_prompt=auto_unique_prompt,disable_paging=disable_paging,disable_echo=disable_echo)
+
+    async def exec_command(self,cmd,timeout=None):
+        '''
+        Same as :func:`redexpect.RedExpect.exec_command`, but a coroutine.
+        '''
+        return((await self.exec_commands([cmd],timeout=timeout))[0])
+
+    async def exec_commands(self,cmds,timeout=None,max_channels=8):
+        '''
+        Same as :func:`redexpect.RedExpect.exec_commands`, but a coroutine.
+        Opening each channel still waits on the server, only waiting for output is left to the event loop.
+        '''
+        run = self._exec_run(cmds,timeout,max_channels)
+        while self._exec_step(run)==False:
+            if run.progressed==False:
+                await self.wait_for_data(self._exec_wait_time(run))
+        return(run.results)
+
+    def read_nowait(self):
+        '''
+        Read what the remote session has sent so far without waiting for more, a piece at a time as it is iterated.
+        Each piece of data read is passed to :func:`redexpect.RedExpect.out_feed`.
+
+        :returns: ``generator`` of ``bytes``, with ``None`` as the last item if the remote session has closed.
+        '''
+        if self.__check_for_attr__('past_login')==False or self.past_login==False:
+            return
+        while self.__shutdown_all__.is_set()==False:
+            with self._block_lock:
+                (size,data) = self.channel.read()
+                eof = size==0 and self.channel.eof()==True
+            if eof==True:
+                yield(None)
+                return
+            if size<=0:
+                return
+            self.out_feed(data[:size])
+            yield(data[:size])
+
+    def wait_fileno(self):
+        if self.__check_for_attr__('past_login')==False:
+            return((None,False))
+        with self._block_lock:
+            block_direction = self.session.block_directions()
+        return((self.sock.fileno(),bool(block_direction & libssh2.LIBSSH2_SESSION_BLOCK_OUTBOUND)))
+
+
+class AsyncTransportSession(AsyncExpectSession,transports.TransportSession):
+    '''
+    A :class:`redexpect.transports.TransportSession` for use with ``asyncio``, see :class:`redexpect.aio.AsyncExpectSession`
+    for which functions are coroutines. This takes the same arguments as :class:`redexpect.transports.TransportSession`.
+    '''
+
+    def read_nowait(self):
+        return(self.read())
+
+    def wait_fileno(self):
+        return((self.transport.fileno(),False))
+
+    async def wait_for_data(self,timeout):
+        if self.transport.fileno()==None:
+            await asyncio.sleep(self.transport.wait_time(timeout))
+            return
+        await super().wait_for_data(timeout)
@@ -0,0 +1,209 @@
+# RedExpect
+# Copyright (C) 2018 - 2020  Red_M ( http://bitbucket.com/Red_M )
+
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+
+import codecs
+
+from redexpect import matcher
+from redexpect import patterns
+from redexpect import terminal
+
+
+class ExpectMatch(object):
+    '''
+    Event emitted by :class:`redexpect.engine.ExpectEngine` when the regexes being expected match.
+
+    :var index: Index of the regex that matched.
+    :var re_string: The regex that matched, without any prefix.
+    :var match: The ``re.Match`` object.
+    :var output: All output up to and including the match, this is removed from the receive buffer.
+    :var match_start: Offset of the match in ``output``.
+    '''
+    __slots__ = ('index','re_string','match','output','match_start')
+
+    def __init__(self,index,re_string,match,output,match_start):
+        self.index = index
+        self.re_string = re_string
+        self.match = match
+        self.output = output
+        self.match_start = match_start
+
+    @property
+    def before(self):
+        '''
+        :returns: ``str`` or ``bytes`` - Output before the match.
+        '''
+        return(self.output[:self.match_start])
+
+    @property
+    def after(self):
+        '''
+        :returns: ``str`` or ``bytes`` - The matched text.
+        '''
+        return(self.output[self.match_start:])
+
+    def __repr__(self):
+        return('ExpectMatch('+str(self.index)+', '+repr(self.after)+')')
+
+
+class ExpectEngine(object):
+    '''
+    The part of expecting that doesn't do any I/O, raw data from any transport goes in and
+    :class:`redexpect.engine.ExpectMatch` events come out.
+
+    Data is decoded incrementally, cleaned with a :class:`redexpect.terminal.TerminalFilter` and kept in a
+    :class:`redexpect.matcher.StreamMatcher` until a match consumes it. Reading from and waiting on a transport is left
+    to whatever drives the engine, eg :class:`redexpect.session.ExpectSession`.
+
+    :param encoding: Encoding to decode data with.
+    :type encoding: ``str``
+    :param encoding_errors: How to handle data that can't be decoded, passed to :func:`codecs.getincrementaldecoder`.
+    :type encoding_errors: ``str``
+    :param bytes_mode: Set to ``True`` to match ``bytes`` without decoding data at all.
+    :type bytes_mode: ``bool``
+    :param lookbehind: Amount of characters of already searched output to search again when new output arrives.
+    :type lookbehind: ``int``
+    :param max_buffer: Most amount of characters to buffer, ``0`` for no limit, see :class:`redexpect.matcher.StreamMatcher`.
+    :type max_buffer: ``int``
+    :param ring_buffer: Set to ``True`` to throw away the oldest output past ``max_buffer`` instead of raising :class:`redexpect.exceptions.BufferOverflow`.
+    :type ring_buffer: ``bool``
+    '''
+    def __init__(self,encoding='utf8',encoding_errors='strict',bytes_mode=False,lookbehind=4096,max_buffer=0,ring_buffer=False):
+        self.encoding = encoding
+        self.encoding_errors = encoding_errors
+        self.bytes_mode = bytes_mode
+        self.lookbehind = lookbehind
+        self.decoder = codecs.getincrementaldecoder(self.encoding)(errors=self.encoding_errors)
+        self.terminal_filter = terminal.TerminalFilter()
+        self.receive_buffer = matcher.StreamMatcher(binary=self.bytes_mode,max_size=max_buffer,ring=ring_buffer)
+        self.pattern_set = None
+        self.searches = 0
+
+    def reset(self):
+        '''
+        Throw away all buffered output and any partly received characters or escape sequences, eg for a new connection.
+        '''
+        self.decoder.reset()
+        self.terminal_filter.reset()
+        self.receive_buffer.consume(len(self.receive_buffer))
+        self.pattern_set = None
+
+    def discard(self):
+        '''
+        Throw away all buffered output, unlike :func:`redexpect.engine.ExpectEngine.reset` partly received characters and escape sequences are kept.
+        '''
+        self.receive_buffer.consume(len(self.receive_buffer))
+
+    def native(self,string):
+        '''
+        :returns: ``string`` as ``bytes`` when :var:`redexpect.engine.ExpectEngine.bytes_mode` is set.
+        '''
+        if self.bytes_mode==True and isinstance(string,str):
+            return(string.encode(self.encoding))
+        return(string)
+
+    def decode(self,data):
+        '''
+        :returns: ``data`` decoded, with incomplete characters at the end held back until the rest of them arrive.
+        '''
+        if self.bytes_mode==True:
+            return(data)
+        return(self.decoder.decode(data))
+
+    def clean(self,text,strip_ansi=True):
+        '''
+        :returns: ``text`` without carriage returns and terminal escape sequences, see :class:`redexpect.terminal.TerminalFilter`.
+        '''
+        return(self.terminal_filter.feed(text,strip_ansi=strip_ansi))
+
+    def compile(self,re_strings,prefix=''):
+        '''
+        :returns: :class:`redexpect.patterns.PatternSet` for ``re_strings`` that matches the engine's output type.
+        '''
+        return(patterns.compile_patterns(re_strings,prefix=prefix,binary=self.bytes_mode))
+
+    def begin(self,pattern_set,full_history=False):
+        '''
+        Start expecting a pattern set, output already in the buffer is searched straight away.
+
+        :param pattern_set: Regexes to expect.
+        :type pattern_set: :class:`redexpect.patterns.PatternSet`
+        :param full_history: Set to ``True`` to search all output each time more arrives.
+        :type full_history: ``bool``
+        :returns: :class:`redexpect.engine.ExpectMatch` or ``None`` if nothing matched yet.
+        '''
+        self.pattern_set = pattern_set
+        self.receive_buffer.begin(pattern_set,lookbehind=self.lookbehind,full_history=full_history)
+        return(self._search())
+
+    def feed(self,data,strip_ansi=True):
+        '''
+        Decode, clean and buffer raw data from a transport.
+
+        :param data: Raw data.
+        :type data: ``bytes``
+        :param strip_ansi: Set to ``False`` to only remove carriage returns.
+        :type strip_ansi: ``bool``
+        :returns: :class:`redexpect.engine.ExpectMatch` or ``None`` if nothing matched yet.
+        '''
+        return(self.feed_text(self.clean(self.decode(data),strip_ansi=strip_ansi)))
+
+    def feed_text(self,text):
+        '''
+        Buffer output that has already been decoded and cleaned.
+        Once a match has been emitted output is only buffered until :func:`redexpect.engine.ExpectEngine.begin` is called again.
+
+        :returns: :class:`redexpect.engine.ExpectMatch` or ``None`` if nothing matched yet.
+        '''
+        self.receive_buffer.feed(text)
+        return(self._search())
+
+    def drain(self):
+        '''
+        Remove and return buffered output that a match can no longer start in, so output can be passed on as it arrives
+        instead of piling up until the match. This is everything up to the last newline, or everything but the last
+        :var:`redexpect.engine.ExpectEngine.lookbehind` characters when the last line is longer than that,
+        so matches must not span a newline or be longer than ``lookbehind``.
+
+        :returns: ``str`` or ``bytes``
+        '''
+        output = self.receive_buffer.output()
+        end = max(output.rfind(self.native('\n'))+1,len(output)-self.lookbehind)
+        if end<=0:
+            return(output[:0])
+        return(self.receive_buffer.consume(end))
+
+    def _search(self):
+        if self.pattern_set==None or len(self.pattern_set)==0:
+            return(None)
+        self.searches += 1
+        found = self.receive_buffer.search()
+        if found==None:
+            return(None)
+        (index,match) = found
+        (match_start,match_end) = self.receive_buffer.span(match)
+        output = self.receive_buffer.consume(match_end)
+        pattern_set = self.pattern_set
+        self.pattern_set = None
+        return(ExpectMatch(index,pattern_set.re_strings[index],match,output,match_start))
+
+    @property
+    def buffer(self):
+        '''
+        :returns: ``str`` or ``bytes`` - Output received but not consumed by a match yet.
+        '''
+        return(self.receive_buffer.output())
@@ -35,4 +35,33 @@ class ExpectTimeout(RedExpectException):
     def __init__(self,wait_object):
         RedExpectException.__init__(self,'Timed out waiting for '+str(wait_object)+'.')
 
+class BufferOverflow(RedExpectException):
+    '''
+    This will be raised when more output arrives while expecting than the session's receive buffer may hold,
+    see :var:`redexpect.RedExpect.expect_max_buffer`.
+    '''
+    def __init__(self,size,max_size):
+        RedExpectException.__init__(self,'Receive buffer overflowed, '+str(size)+' characters received while the limit is '+str(max_size)+'.')
+        self.size = size
+        self.max_size = max_size
 
+class CommandFailed(RedExpectException):
+    '''
+    This will be raised when a command run with ``capture_status`` exits with a non-zero status,
+    see :func:`redexpect.RedExpect.command`.
+    '''
+    def __init__(self,cmd,result):
+        RedExpectException.__init__(self,'Command '+repr(cmd)+' exited with status '+str(result.exit_status)+'.')
+        self.cmd = cmd
+        self.exit_status = result.exit_status
+        self.result = result
+
+class ChannelReadError(RedExpectException):
+    '''
+    This will be raised when reading the output of a command run by :func:`redexpect.RedExpect.exec_commands` fails,
+    eg because its channel was closed or the connection was lost.
+    '''
+    def __init__(self,cmd,error_code):
+        RedExpectException.__init__(self,'Reading the output of '+repr(cmd)+' failed with libssh2 error '+str(error_code)+'.')
+        self.cmd = cmd
+        self.error_code = error_code
@@ -0,0 +1,233 @@
+# RedExpect
+# Copyright (C) 2018 - 2020  Red_M ( http://bitbucket.com/Red_M )
+
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+
+import time
+import concurrent.futures
+
+from redexpect.redexpect import RedExpect
+
+
+class HostResult(object):
+    '''
+    The outcome of running against a single host in a :class:`redexpect.fleet.Fleet`.
+
+    :var host: Hostname the result is for.
+    :var result: Return value of the function that was run, ``None`` if it failed.
+    :var error: Exception raised while logging in or running the function, ``None`` if it succeeded.
+    :var started: ``time.monotonic()`` of when work on the host started.
+    :var finished: ``time.monotonic()`` of when work on the host finished.
+    '''
+    def __init__(self,host,result=None,error=None,started=0.0,finished=0.0):
+        self.host = host
+        self.result = result
+        self.error = error
+        self.started = started
+        self.finished = finished
+
+    def __repr__(self):
+        if self.ok==True:
+            return('HostResult('+repr(self.host)+', result='+repr(self.result)+')')
+        return('HostResult('+repr(self.host)+', error='+repr(self.error)+')')
+
+    @property
+    def ok(self):
+        '''
+        :returns: ``bool`` - ``True`` if the host did not raise an error.
+        '''
+        return(self.error==None)
+
+    @property
+    def duration(self):
+        '''
+        :returns: ``float`` - Seconds spent on the host, including logging in.
+        '''
+        return(self.finished-self.started)
+
+
+class FleetStats(object):
+    '''
+    Throughput and latency of a run across a :class:`redexpect.fleet.Fleet`, updated as hosts finish.
+    '''
+    def __init__(self):
+        self.started = time.monotonic()
+        self.finished = self.started
+        self.succeeded = 0
+        self.failed = 0
+        self.durations = []
+
+    def add(self,host_result):
+        '''
+        Count a finished host.
+
+        :param host_result: The finished host.
+        :type host_result: :class:`redexpect.fleet.HostResult`
+        '''
+        if host_result.ok==True:
+            self.succeeded += 1
+        else:
+            self.failed += 1
+        self.durations.append(host_result.duration)
+        self.finished = time.monotonic()
+
+    @property
+    def hosts(self):
+        return(self.succeeded+self.failed)
+
+    @property
+    def elapsed(self):
+        return(self.finished-self.started)
+
+    @property
+    def hosts_per_second(self):
+        if self.elapsed==0:
+            return(0.0)
+        return(self.hosts/self.elapsed)
+
+    def latency(self,percentile):
+        '''
+        :param percentile: Percentile of host durations to get, between ``0`` and ``100``.
+        :type percentile: ``float``
+        :returns: ``float`` - Seconds, ``0.0`` if no hosts have finished.
+        '''
+        if len(self.durations)==0:
+            return(0.0)
+        durations = sorted(self.durations)
+        index = int(round((percentile/100.0)*(len(durations)-1)))
+        return(durations[index])
+
+    def as_dict(self):
+        '''
+        :returns: ``dict`` - A summary of the run so far.
+        '''
+        return({
+            'hosts':self.hosts,
+            'succeeded':self.succeeded,
+            'failed':self.failed,
+            'elapsed':self.elapsed,
+            'hosts_per_second':self.hosts_per_second,
+            'latency_min':self.latency(0),
+            'latency_p50':self.latency(50),
+            'latency_p95':self.latency(95),
+            'latency_max':self.latency(100)
+        })
+
+
+class Fleet(object):
+    '''
+    Log into many hosts and run against them concurrently, with a bounded number of sessions open at once.
+
+    Hosts are worked on by a pool of threads, a session spends most of its time waiting on the network so threads scale
+    well here. Results are yielded as each host finishes, in whatever order that happens in.
+
+    :param hosts: Hostnames to run against, or ``dict`` of keyword arguments for :func:`redexpect.RedExpect.login` for hosts that need different ones.
+    :type hosts: ``array`` of ``str`` or ``dict``
+    :param max_workers: Most amount of hosts to work on at once.
+    :type max_workers: ``int``
+    :param host_timeout: Seconds each host has to log in and finish, past this any expect on the host raises :class:`redexpect.exceptions.ExpectTimeout`. ``None`` to disable.
+    :type host_timeout: ``float``
+    :param session_class: Class to create sessions from, useful for subclasses with their own :func:`redexpect.RedExpect.device_init`.
+    :type session_class: :class:`redexpect.RedExpect`
+    :param session_kwargs: Keyword arguments for creating each session.
+    :type session_kwargs: ``dict``
+    :param login_kwargs: Keyword arguments for :func:`redexpect.RedExpect.login` shared by all hosts, eg ``username`` and ``password``.
+    :type login_kwargs: ``dict``
+    :param pool: Pool to take sessions from and give them back to instead of logging in and out of every host each run,
+                 ``session_class`` and ``session_kwargs`` are then taken from the pool.
+    :type pool: :class:`redexpect.pool.SessionPool`
+    '''
+    def __init__(self,hosts,max_workers=32,host_timeout=None,session_class=RedExpect,session_kwargs={},login_kwargs={},pool=None):
+        self.hosts = hosts
+        self.max_workers = max_workers
+        self.host_timeout = host_timeout
+        self.session_class = session_class
+        self.session_kwargs = session_kwargs
+        self.login_kwargs = login_kwargs
+        self.pool = pool
+        self.stats = FleetStats()
+
+    def _run_host(self,host,func):
+        started = time.monotonic()
+        login_kwargs = dict(self.login_kwargs)
+        if isinstance(host,dict):
+            login_kwargs.update(host)
+        else:
+            login_kwargs['hostname'] = host
+        hostname = login_kwargs.get('hostname')
+        if self.host_timeout!=None:
+            login_kwargs.setdefault('timeout',self.host_timeout)
+        if self.pool!=None:
+            return(self._run_pooled(hostname,login_kwargs,func,started))
+        session = self.session_class(**self.session_kwargs)
+        if self.host_timeout!=None:
+            session.expect_deadline = started+self.host_timeout
+        try:
+            session.login(**login_kwargs)
+            result = func(session)
+            return(HostResult(hostname,result=result,started=started,finished=time.monotonic()))
+        except Exception as e:
+            return(HostResult(hostname,error=e,started=started,finished=time.monotonic()))
+        finally:
+            session.exit()
+
+    def _run_pooled(self,hostname,login_kwargs,func,started):
+        try:
+            session = self.pool.acquire(**login_kwargs)
+        except Exception as e:
+            return(HostResult(hostname,error=e,started=started,finished=time.monotonic()))
+        if self.host_timeout!=None:
+            session.expect_deadline = started+self.host_timeout
+        try:
+            result = func(session)
+        except Exception as e:
+            self.pool.release(session,discard=True)
+            return(HostResult(hostname,error=e,started=started,finished=time.monotonic()))
+        self.pool.release(session)
+        return(HostResult(hostname,result=result,started=started,finished=time.monotonic()))
+
+    def run(self,func):
+        '''
+        Log into every host and run a function against each session.
+        Errors raised by a host are caught and returned in its :class:`redexpect.fleet.HostResult`.
+
+        :param func: Function that takes a logged in :class:`redexpect.RedExpect` and returns a result.
+        :type func: ``function``
+        :returns: ``generator`` of :class:`redexpect.fleet.HostResult` - Yielded as hosts finish.
+        '''
+        self.stats = FleetStats()
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = [executor.submit(self._run_host,host,func) for host in self.hosts]
+            for future in concurrent.futures.as_completed(futures):
+                host_result = future.result()
+                self.stats.add(host_result)
+                yield(host_result)
+
+    def command(self,cmd,**kwargs):
+        '''
+        Run a command on every host, takes the same arguments as :func:`redexpect.RedExpect.command`.
+
+        :returns: ``generator`` of :class:`redexpect.fleet.HostResult`
+        '''
+        return(self.run(lambda session:session.command(cmd,**kwargs)))
+
+    def command_batch(self,cmds,**kwargs):
+        '''
+        Run a batch of commands on every host, takes the same arguments as :func:`redexpect.RedExpect.command_batch`.
+
+        :returns: ``generator`` of :class:`redexpect.fleet.HostResult`
+        '''
+        return(self.run(lambda session:session.command_batch(cmds,**kwargs)))
@@ -0,0 +1,160 @@
+# RedExpect
+# Copyright (C) 2018 - 2020  Red_M ( http://bitbucket.com/Red_M )
+
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+
+from redexpect import exceptions
+
+
+class StreamMatcher(object):
+    '''
+    Receive buffer for a session that matches a :class:`redexpect.patterns.PatternSet` against text as it arrives.
+
+    Text stays in the buffer until it is consumed by :func:`redexpect.matcher.StreamMatcher.consume`, so anything
+    received after a match is kept for the next search instead of being thrown away.
+
+    After the first search for a pattern set, only the newly fed text plus the last ``lookbehind`` characters of what
+    came before are searched, so the cost of waiting on a large output stays linear in its size.
+    A match that needs to start further back than ``lookbehind`` characters from the new text will not be found,
+    set ``full_history`` to ``True`` to search the entire buffer every time instead.
+
+    The buffer can be given a hard limit with ``max_size``. Past it the oldest text is thrown away so only the last
+    ``max_size`` characters are kept and searched, then :class:`redexpect.exceptions.BufferOverflow` is raised unless
+    ``ring`` is set.
+
+    :param binary: Set to ``True`` when the buffer holds ``bytes``.
+    :type binary: ``bool``
+    :param max_size: Most amount of characters to hold, ``0`` for no limit.
+    :type max_size: ``int``
+    :param ring: Set to ``True`` to throw away the oldest text past ``max_size`` instead of raising.
+    :type ring: ``bool``
+    '''
+    def __init__(self,binary=False,max_size=0,ring=False):
+        self.empty = ''
+        if binary==True:
+            self.empty = b''
+        self.max_size = max_size
+        self.ring = ring
+        self.discarded = 0
+        self.pattern_set = None
+        self.lookbehind = 4096
+        self.full_history = False
+        self.chunks = []
+        self.length = 0
+        self.searched = 0
+        self.window = self.empty
+        self.window_start = 0
+
+    def __len__(self):
+        return(self.length)
+
+    def begin(self,pattern_set,lookbehind=4096,full_history=False):
+        '''
+        Start searching for a new pattern set, the next search covers everything in the buffer.
+
+        :param pattern_set: Regexes to search for.
+        :type pattern_set: :class:`redexpect.patterns.PatternSet`
+        :param lookbehind: Amount of characters of already searched text to include when searching new text.
+        :type lookbehind: ``int``
+        :param full_history: Set to ``True`` to always search the entire buffer.
+        :type full_history: ``bool``
+        '''
+        self.pattern_set = pattern_set
+        self.lookbehind = lookbehind
+        self.full_history = full_history
+        self.searched = 0
+        self.window = self.output()
+        self.window_start = 0
+
+    def feed(self,text):
+        '''
+        Add text to the buffer.
+
+        :param text: Text received from the remote session.
+        :type text: ``str`` or ``bytes``
+        '''
+        if len(text)==0:
+            return
+        self.chunks.append(text)
+        self.length += len(text)
+        cut = 0
+        if self.full_history==False:
+            cut = max(0,self.searched-self.lookbehind-self.window_start)
+        self.window = self.window[cut:]+text
+        self.window_start += cut
+        if self.max_size!=0 and self.length>self.max_size:
+            length = self.length
+            self._discard(self.length-self.max_size)
+            if self.ring==False:
+                raise(exceptions.BufferOverflow(length,self.max_size))
+
+    def _discard(self,amount):
+        # Drop the oldest text and move every offset back to match.
+        remainder = self.output()[amount:]
+        self.chunks = [remainder]
+        self.length = len(remainder)
+        self.discarded += amount
+        self.searched = max(0,self.searched-amount)
+        self.window_start -= amount
+        if self.window_start<0:
+            self.window = self.window[-self.window_start:]
+            self.window_start = 0
+
+    def search(self):
+        '''
+        Search the buffer for the highest priority regex that matches.
+
+        :returns: ``tuple (int, re.Match)`` of the regex index and the match, with match offsets relative to
+                  :var:`redexpect.matcher.StreamMatcher.window_start` or ``None`` if nothing matched.
+        '''
+        self.searched = self.length
+        return(self.pattern_set.search(self.window))
+
+    def span(self,match):
+        '''
+        :returns: ``tuple (int, int)`` - Start and end of ``match`` as offsets into the buffer.
+        '''
+        return((self.window_start+match.start(),self.window_start+match.end()))
+
+    def consume(self,end):
+        '''
+        Remove text from the start of the buffer.
+
+        :param end: Amount of characters to remove.
+        :type end: ``int``
+        :returns: ``str`` or ``bytes`` - The removed text.
+        '''
+        output = self.output()
+        consumed = output[:end]
+        remainder = output[end:]
+        self.chunks = []
+        if len(remainder)>0:
+            self.chunks.append(remainder)
+        self.length = len(remainder)
+        self.searched = max(0,self.searched-end)
+        self.window = remainder
+        self.window_start = 0
+        return(consumed)
+
+    def output(self):
+        '''
+        :returns: ``str`` or ``bytes`` - All text in the buffer.
+        '''
+        if len(self.chunks)>1:
+            self.chunks = [self.empty.join(self.chunks)]
+        if len(self.chunks)==0:
+            return(self.empty)
+        return(self.chunks[0])
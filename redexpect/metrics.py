@@ -0,0 +1,146 @@
+# RedExpect
+# Copyright (C) 2018 - 2020  Red_M ( http://bitbucket.com/Red_M )
+
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+
+import socket
+import threading
+
+# Timings, in seconds.
+CONNECT = 'connect'
+DEVICE_INIT = 'device_init'
+PROMPT_DISCOVERY = 'prompt_discovery'
+SUDO = 'sudo'
+EXPECT = 'expect'
+FIRST_BYTE = 'first_byte'
+# Counts.
+BYTES_IN = 'bytes_in'
+BYTES_OUT = 'bytes_out'
+CHUNKS_READ = 'chunks_read'
+REGEX_SEARCHES = 'regex_searches'
+
+
+class Metrics(object):
+    '''
+    Where a session reports how long each phase took and how much it moved, see the ``metrics`` argument of
+    :class:`redexpect.RedExpect`. This one throws everything away, subclass it to send them somewhere.
+
+    Timings are reported as they finish:
+
+    * ``connect`` - connecting and authenticating in :func:`redexpect.RedExpect.login`.
+    * ``device_init`` - :func:`redexpect.RedExpect.device_init` and the first prompt.
+    * ``prompt_discovery`` - :func:`redexpect.RedExpect.set_unique_prompt`.
+    * ``sudo`` - :func:`redexpect.RedExpect.sudo`.
+    * ``expect`` - each :func:`redexpect.RedExpect.expect` that matched, from the start of expecting to the match.
+    * ``first_byte`` - from sending a command in :func:`redexpect.RedExpect.command` to the first output after it.
+
+    Counts are added up in the session and reported once per matched expect, so the expect loop itself only adds to integers:
+    ``bytes_in``, ``bytes_out`` (characters sent), ``chunks_read`` and ``regex_searches``.
+    '''
+
+    def timing(self,name,seconds):
+        '''
+        :param name: Name of the phase.
+        :type name: ``str``
+        :param seconds: How long it took.
+        :type seconds: ``float``
+        '''
+        pass
+
+    def count(self,name,value):
+        '''
+        :param name: Name of the counter.
+        :type name: ``str``
+        :param value: Amount to add to it.
+        :type value: ``int``
+        '''
+        pass
+
+NULL_METRICS = Metrics()
+
+
+class StatsdMetrics(Metrics):
+    '''
+    Sends metrics to a StatsD server over UDP, timings as ``<prefix>.<name>:<milliseconds>|ms`` and counts as ``<prefix>.<name>:<value>|c``.
+    Sending never blocks and any errors are ignored, lost metrics are better than a stalled session.
+
+    :param host: StatsD server.
+    :type host: ``str``
+    :param port: StatsD port.
+    :type port: ``int``
+    :param prefix: Prefix for every metric name.
+    :type prefix: ``str``
+    '''
+    def __init__(self,host='localhost',port=8125,prefix='redexpect'):
+        self.address = (host,port)
+        self.prefix = prefix
+        self.sock = socket.socket(socket.AF_INET,socket.SOCK_DGRAM)
+        self.sock.setblocking(False)
+
+    def _send(self,line):
+        try:
+            self.sock.sendto(line.encode('utf8'),self.address)
+        except (IOError,OSError):
+            pass
+
+    def timing(self,name,seconds):
+        self._send(self.prefix+'.'+name+':'+str(round(seconds*1000.0,3))+'|ms')
+
+    def count(self,name,value):
+        self._send(self.prefix+'.'+name+':'+str(value)+'|c')
+
+
+class PrometheusMetrics(Metrics):
+    '''
+    Records metrics with ``prometheus_client``, timings in a histogram called ``<namespace>_<name>_seconds`` and counts
+    in a counter called ``<namespace>_<name>_total``. Share one instance between sessions and expose ``registry`` however
+    the rest of the program does, eg with ``prometheus_client.start_http_server``.
+
+    Needs ``prometheus_client``, install it with ``pip install redexpect[prometheus]``.
+
+    :param registry: Registry to add the metrics to, ``None`` for ``prometheus_client.REGISTRY``.
+    :type registry: ``prometheus_client.CollectorRegistry``
+    :param namespace: Prefix for every metric name.
+    :type namespace: ``str``
+    '''
+    def __init__(self,registry=None,namespace='redexpect'):
+        import prometheus_client
+        self.prometheus_client = prometheus_client
+        if registry==None:
+            registry = prometheus_client.REGISTRY
+        self.registry = registry
+        self.namespace = namespace
+        self.histograms = {}
+        self.counters = {}
+        self.lock = threading.Lock()
+
+    def _metric(self,metrics,name,create):
+        metric = metrics.get(name)
+        if metric==None:
+            with self.lock:
+                metric = metrics.get(name)
+                if metric==None:
+                    metric = create()
+                    metrics[name] = metric
+        return(metric)
+
+    def timing(self,name,seconds):
+        create = lambda:self.prometheus_client.Histogram(name+'_seconds','RedExpect '+name+' time.',namespace=self.namespace,registry=self.registry)
+        self._metric(self.histograms,name,create).observe(seconds)
+
+    def count(self,name,value):
+        create = lambda:self.prometheus_client.Counter(name,'RedExpect '+name+'.',namespace=self.namespace,registry=self.registry)
+        self._metric(self.counters,name,create).inc(value)
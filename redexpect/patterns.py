@@ -0,0 +1,271 @@
+# RedExpect
+# Copyright (C) 2018 - 2020  Red_M ( http://bitbucket.com/Red_M )
+
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+
+import re
+import functools
+try:
+    from re import _parser as sre_parse
+except ImportError: # Python < 3.11
+    import sre_parse
+
+# Backreferences, conditionals and inline flags change meaning or fail to
+# compile once patterns are joined into a single alternation.
+UNCOMBINABLE_REGEX = re.compile(r'\\[1-9]|\(\?P=|\(\?\(|\(\?[aiLmsux]+\)')
+UNCOMBINABLE_REGEX_BYTES = re.compile(UNCOMBINABLE_REGEX.pattern.encode('ascii'))
+PATTERN_CACHE_SIZE = 512
+# Longest required literal kept per regex for the prefilter, any part of a required literal is still required.
+PREFILTER_LITERAL_LENGTH = 32
+
+
+class PatternSet(object):
+    '''
+    A compiled, reusable set of regexes to expect.
+    Can be passed anywhere a regex string or list of regex strings is accepted by :func:`redexpect.RedExpect.expect`,
+    :func:`redexpect.RedExpect.prompt` and :func:`redexpect.RedExpect.sudo`.
+
+    The regexes are also joined into a single alternation so that output with no match in it is only scanned once,
+    the individual regexes are only tried when the alternation matches to keep the list order as the match priority.
+
+    When every regex contains a literal that any match of it must contain, eg ``Invalid input`` in ``% Invalid input.*``,
+    those literals are built into a trie and compiled as one regex that is used instead of the alternation.
+    Output without any of the literals is rejected in a single pass whose cost barely grows with the amount of regexes,
+    and when one turns up only the regexes whose literal is in the output are tried.
+    Use :func:`redexpect.patterns.compile_patterns` to get a cached instance instead of building one each time.
+
+    :param re_strings: Either a regex string or list of regex strings.
+    :type re_strings: ``array`` or ``regex str``
+    :param prefix: A prefix to add to each of the regexes.
+    :type prefix: ``str``
+    :param flags: Flags to compile the regexes with.
+    :type flags: ``int``
+    :param binary: Set to ``True`` to match against ``bytes``, any ``str`` regexes are encoded as latin-1.
+    :type binary: ``bool``
+    '''
+    def __init__(self,re_strings,prefix='',flags=re.DOTALL,binary=False):
+        if isinstance(re_strings,(str,bytes)):
+            if len(re_strings)==0:
+                re_strings = []
+            else:
+                re_strings = [re_strings]
+        self.binary = binary
+        self.re_strings = tuple([self._native(re_string) for re_string in re_strings])
+        self.prefix = self._native(prefix)
+        self.flags = flags
+        self.expressions = tuple([self.prefix+re_string for re_string in self.re_strings])
+        self.patterns = tuple([re.compile(expression,flags) for expression in self.expressions])
+        self.combined = self._combine()
+        self.literals = tuple([required_literal(expression,flags) for expression in self.expressions])
+        self.prefilter = self._prefilter()
+        self._cleaners = {}
+
+    def __len__(self):
+        return(len(self.patterns))
+
+    def __repr__(self):
+        return('PatternSet('+repr(list(self.expressions))+')')
+
+    def _native(self,re_string):
+        if self.binary==True and isinstance(re_string,str):
+            return(re_string.encode('latin-1'))
+        if self.binary==False and isinstance(re_string,bytes):
+            return(re_string.decode('latin-1'))
+        return(re_string)
+
+    def _combine(self):
+        if len(self.patterns)<2:
+            return(None)
+        uncombinable = UNCOMBINABLE_REGEX
+        (start,separator,end) = ('(?:','|',')')
+        if self.binary==True:
+            uncombinable = UNCOMBINABLE_REGEX_BYTES
+            (start,separator,end) = (b'(?:',b'|',b')')
+        for expression in self.expressions:
+            if uncombinable.search(expression):
+                return(None)
+        try:
+            return(re.compile(separator.join([start+expression+end for expression in self.expressions]),self.flags))
+        except re.error:
+            return(None)
+
+    def _prefilter(self):
+        if len(self.patterns)<2 or None in self.literals:
+            return(None)
+        return(re.compile(literal_trie(self.literals,self.binary)))
+
+    def search(self,string,pos=0):
+        '''
+        Search a string for the highest priority regex that matches.
+
+        :param string: String to search.
+        :type string: ``str``
+        :param pos: Position in the string to start the search from.
+        :type pos: ``int``
+        :returns: ``tuple (int, re.Match)`` of the regex index and its match or ``None`` if nothing matched.
+        '''
+        if self.prefilter!=None:
+            if self.prefilter.search(string,pos)==None:
+                return(None)
+            for (index,pattern) in enumerate(self.patterns):
+                if string.find(self.literals[index],pos)!=-1:
+                    match = pattern.search(string,pos)
+                    if match:
+                        return((index,match))
+            return(None)
+        if self.combined!=None and self.combined.search(string,pos)==None:
+            return(None)
+        for (index,pattern) in enumerate(self.patterns):
+            match = pattern.search(string,pos)
+            if match:
+                return((index,match))
+        return(None)
+
+    def cleaner(self,index):
+        '''
+        :returns: compiled ``regex`` of the regex at ``index`` without the prefix or flags, used to remove matches from cleaned output.
+        '''
+        if not index in self._cleaners:
+            self._cleaners[index] = re.compile(self.re_strings[index])
+        return(self._cleaners[index])
+
+
+def required_literal(expression,flags=0):
+    '''
+    Find the longest run of literal characters that every match of a regex contains.
+    Only the parts of the regex that must match exactly once are looked at, so the literal in ``(abc)?`` or ``a|b`` isn't found.
+
+    :param expression: Regex to look in.
+    :type expression: ``regex str`` or ``regex bytes``
+    :param flags: Flags the regex is compiled with.
+    :type flags: ``int``
+    :returns: ``str`` or ``bytes`` of at most :var:`redexpect.patterns.PREFILTER_LITERAL_LENGTH` characters, ``None`` if there isn't one.
+    '''
+    try:
+        parsed = sre_parse.parse(expression,flags)
+    except (re.error,RecursionError):
+        return(None)
+    flags = flags|_parsed_flags(parsed)
+    if flags & re.IGNORECASE:
+        return(None)
+    runs = [[]]
+    _literal_runs(parsed,runs)
+    longest = max(runs,key=len)
+    if len(longest)==0:
+        return(None)
+    longest = longest[:PREFILTER_LITERAL_LENGTH]
+    if isinstance(expression,bytes):
+        return(bytes(longest))
+    return(''.join([chr(code) for code in longest]))
+
+def _parsed_flags(parsed):
+    # Inline flags such as (?i) are kept on parsed.state from Python 3.8, parsed.pattern before that.
+    state = getattr(parsed,'state',None)
+    if state==None:
+        state = getattr(parsed,'pattern',None)
+    return(getattr(state,'flags',0))
+
+def _literal_runs(parsed,runs):
+    # Appends literal codes to the last run, anything that isn't a literal matched exactly once starts a new run.
+    for (op,av) in parsed:
+        if op==sre_parse.LITERAL:
+            runs[-1].append(av)
+        elif op==sre_parse.SUBPATTERN and (len(av)==2 or av[1] & re.IGNORECASE==0):
+            _literal_runs(av[-1],runs)
+        else:
+            runs.append([])
+
+def literal_trie(literals,binary=False):
+    '''
+    Build a regex that matches any of ``literals``, as a trie so each position is only tried against the literals that
+    start with the character there. A literal that starts with another literal is left out as it can't be found
+    without finding the shorter one.
+
+    :param literals: Literals to match.
+    :type literals: ``array`` of ``str`` or ``bytes``
+    :param binary: Set to ``True`` when the literals are ``bytes``.
+    :type binary: ``bool``
+    :returns: ``regex str`` or ``regex bytes``
+    '''
+    trie = {}
+    for literal in sorted(set(literals),key=len):
+        node = trie
+        for code in literal:
+            if node.get(None)==True:
+                break
+            node = node.setdefault(code,{})
+        else:
+            node.clear()
+            node[None] = True
+    empty = ''
+    if binary==True:
+        empty = b''
+    return(_trie_regex(trie,binary,empty))
+
+def _trie_regex(node,binary,empty):
+    branches = []
+    for code in sorted([code for code in node if code!=None]):
+        if binary==True:
+            char = re.escape(bytes([code]))
+        else:
+            char = re.escape(code)
+        branches.append(char+_trie_regex(node[code],binary,empty))
+    if len(branches)<2:
+        return(empty.join(branches))
+    if binary==True:
+        return(b'(?:'+b'|'.join(branches)+b')')
+    return('(?:'+'|'.join(branches)+')')
+
+def to_expressions(re_strings):
+    '''
+    Turn a regex string, list of regex strings or a :class:`redexpect.patterns.PatternSet` into a ``tuple`` of regex
+    strings with any prefix already applied, useful for adding regexes to another set.
+
+    :returns: ``tuple`` of ``regex str``
+    '''
+    if isinstance(re_strings,PatternSet):
+        return(re_strings.expressions)
+    if isinstance(re_strings,(str,bytes)):
+        if len(re_strings)==0:
+            return(())
+        return((re_strings,))
+    return(tuple(re_strings))
+
+@functools.lru_cache(maxsize=PATTERN_CACHE_SIZE)
+def _cached_pattern_set(re_strings,prefix,flags,binary):
+    return(PatternSet(re_strings,prefix,flags,binary))
+
+def compile_patterns(re_strings,prefix='',flags=re.DOTALL,binary=False):
+    '''
+    Get a :class:`redexpect.patterns.PatternSet` from an LRU cache keyed on ``(prefix, re_strings, flags, binary)``.
+    If ``re_strings`` is already a :class:`redexpect.patterns.PatternSet` it is returned as is, unless it needs to be
+    recompiled to match ``bytes`` instead of ``str`` or the other way around.
+
+    :param re_strings: Either a regex string, list of regex strings or a :class:`redexpect.patterns.PatternSet`.
+    :type re_strings: ``array``, ``regex str`` or :class:`redexpect.patterns.PatternSet`
+    :param prefix: A prefix to add to each of the regexes.
+    :type prefix: ``str``
+    :param flags: Flags to compile the regexes with.
+    :type flags: ``int``
+    :param binary: Set to ``True`` to match against ``bytes``.
+    :type binary: ``bool``
+    :returns: :class:`redexpect.patterns.PatternSet`
+    '''
+    if isinstance(re_strings,PatternSet):
+        if re_strings.binary==binary:
+            return(re_strings)
+        return(_cached_pattern_set(re_strings.re_strings,re_strings.prefix,re_strings.flags,binary))
+    return(_cached_pattern_set(to_expressions(re_strings),prefix,flags,binary))
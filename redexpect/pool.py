@@ -0,0 +1,183 @@
+# RedExpect
+# Copyright (C) 2018 - 2020  Red_M ( http://bitbucket.com/Red_M )
+
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+
+import time
+import threading
+import contextlib
+
+from redexpect.redexpect import RedExpect
+
+
+class SessionPool(object):
+    '''
+    Keeps logged in sessions open between jobs, so a job against a host that was recently used gets a session that
+    is already at its unique prompt instead of connecting, authenticating and finding the prompt again.
+
+    Sessions are kept per ``(hostname, port, username, privilege)``. An idle session is checked with a prompt probe,
+    an empty command that must get the prompt back within ``probe_timeout``, before it is handed out again and is
+    closed instead if that fails. Sessions idle for longer than ``idle_ttl`` are closed the next time the pool is used,
+    or by calling :func:`redexpect.pool.SessionPool.close_idle`.
+
+    :param session_class: Class to create sessions from.
+    :type session_class: :class:`redexpect.RedExpect`
+    :param session_kwargs: Keyword arguments for creating each session.
+    :type session_kwargs: ``dict``
+    :param login_kwargs: Keyword arguments for :func:`redexpect.RedExpect.login` shared by all sessions, eg ``password``.
+    :type login_kwargs: ``dict``
+    :param idle_ttl: Seconds a session may sit idle before it is closed.
+    :type idle_ttl: ``float``
+    :param max_idle: Most amount of idle sessions to keep per key, more than this are closed when released.
+    :type max_idle: ``int``
+    :param probe_timeout: Seconds an idle session has to answer the prompt probe, ``None`` to hand out idle sessions without probing them.
+    :type probe_timeout: ``float``
+    '''
+    def __init__(self,session_class=RedExpect,session_kwargs={},login_kwargs={},idle_ttl=300.0,max_idle=4,probe_timeout=5.0):
+        self.session_class = session_class
+        self.session_kwargs = session_kwargs
+        self.login_kwargs = login_kwargs
+        self.idle_ttl = idle_ttl
+        self.max_idle = max_idle
+        self.probe_timeout = probe_timeout
+        self.idle = {}
+        self.keys = {}
+        self.lock = threading.Lock()
+        self.logins = 0
+        self.reused = 0
+
+    def __len__(self):
+        with self.lock:
+            return(sum([len(sessions) for sessions in self.idle.values()]))
+
+    def _key(self,login_kwargs,privilege):
+        return((login_kwargs.get('hostname'),login_kwargs.get('port',22),login_kwargs.get('username',''),privilege))
+
+    def acquire(self,hostname,privilege=None,escalate=None,**login_kwargs):
+        '''
+        Get a logged in session for a host, reusing an idle one if there is a healthy one.
+
+        :param hostname: Host to log into.
+        :type hostname: ``str``
+        :param privilege: Name for the privilege level the session is at, sessions are only reused for the same one.
+        :type privilege: ``str``
+        :param escalate: Function called with a newly logged in session to get it to ``privilege``, eg one that calls :func:`redexpect.RedExpect.sudo`.
+        :type escalate: ``function``
+        :param login_kwargs: Keyword arguments for :func:`redexpect.RedExpect.login`, added to the pool's own.
+        :returns: :class:`redexpect.RedExpect`
+        '''
+        kwargs = dict(self.login_kwargs)
+        kwargs.update(login_kwargs)
+        kwargs['hostname'] = hostname
+        key = self._key(kwargs,privilege)
+        self.close_idle()
+        while True:
+            with self.lock:
+                sessions = self.idle.get(key,[])
+                if len(sessions)==0:
+                    break
+                (session,released) = sessions.pop()
+            if self._probe(session)==True:
+                self.reused += 1
+                return(session)
+            self._close(session)
+        session = self.session_class(**self.session_kwargs)
+        try:
+            session.login(**kwargs)
+            if escalate!=None:
+                escalate(session)
+        except Exception:
+            session.exit()
+            raise
+        self.logins += 1
+        with self.lock:
+            self.keys[id(session)] = key
+        return(session)
+
+    def release(self,session,discard=False):
+        '''
+        Give a session back to the pool, it must be at a prompt.
+
+        :param session: A session from :func:`redexpect.pool.SessionPool.acquire`.
+        :type session: :class:`redexpect.RedExpect`
+        :param discard: Set to ``True`` to close the session instead, eg after an error left it in an unknown state.
+        :type discard: ``bool``
+        '''
+        session.expect_deadline = None
+        with self.lock:
+            key = self.keys.get(id(session))
+            if discard==False and key!=None and len(self.idle.get(key,[]))<self.max_idle:
+                self.idle.setdefault(key,[]).append((session,time.monotonic()))
+                return
+            self.keys.pop(id(session),None)
+        session.exit()
+
+    @contextlib.contextmanager
+    def session(self,hostname,privilege=None,escalate=None,**login_kwargs):
+        '''
+        Same as :func:`redexpect.pool.SessionPool.acquire`, but as a context manager that releases the session
+        afterwards, or closes it if the block raised.
+        '''
+        session = self.acquire(hostname,privilege=privilege,escalate=escalate,**login_kwargs)
+        try:
+            yield(session)
+        except BaseException:
+            self.release(session,discard=True)
+            raise
+        self.release(session)
+
+    def _probe(self,session):
+        if self.probe_timeout==None:
+            return(True)
+        try:
+            session.sendline('')
+            return(session.prompt(timeout=self.probe_timeout)==0)
+        except Exception:
+            return(False)
+
+    def _close(self,session):
+        with self.lock:
+            self.keys.pop(id(session),None)
+        try:
+            session.exit()
+        except Exception:
+            pass
+
+    def close_idle(self,idle_ttl=None):
+        '''
+        Close sessions that have been idle for too long.
+
+        :param idle_ttl: Seconds a session may have been idle for, ``None`` to use :var:`redexpect.pool.SessionPool.idle_ttl`.
+        :type idle_ttl: ``float``
+        :returns: ``int`` - Amount of sessions closed.
+        '''
+        if idle_ttl==None:
+            idle_ttl = self.idle_ttl
+        oldest = time.monotonic()-idle_ttl
+        expired = []
+        with self.lock:
+            for (key,sessions) in self.idle.items():
+                expired += [session for (session,released) in sessions if released<=oldest]
+                sessions[:] = [(session,released) for (session,released) in sessions if released>oldest]
+        for session in expired:
+            self._close(session)
+        return(len(expired))
+
+    def close(self):
+        '''
+        Close every idle session.
+        '''
+        self.close_idle(idle_ttl=-1)
@@ -0,0 +1,105 @@
+# RedExpect
+# Copyright (C) 2018 - 2020  Red_M ( http://bitbucket.com/Red_M )
+
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+
+import threading
+
+# Phases of an expect.
+READ = 'read'
+WAIT = 'wait'
+DECODE = 'decode'
+REMOTE_TEXT_CLEAN = 'remote_text_clean'
+SEARCH = 'search'
+# Cleaning output after the match.
+CLEAN = 'clean'
+
+
+class Profile(object):
+    '''
+    Time spent in each phase of a session's expects, see the ``profile`` argument of :class:`redexpect.RedExpect`.
+    Time is added up per stack of phase names, eg ``('expect', 'decode')``:
+
+    * ``expect;read`` - reading from the transport.
+    * ``expect;wait`` - waiting on the transport for more data.
+    * ``expect;decode`` - :func:`redexpect.RedExpect.decode`.
+    * ``expect;remote_text_clean`` - :func:`redexpect.RedExpect.remote_text_clean`.
+    * ``expect;search`` - buffering output and searching it for the regexes being expected.
+    * ``clean`` - removing the echoed command and the prompt from output after the match.
+
+    One profile can be shared between sessions, eg all the sessions of a :class:`redexpect.fleet.Fleet` run
+    by passing it in ``session_kwargs``, to get a breakdown for the whole run.
+    '''
+    def __init__(self):
+        self.stacks = {}
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return(len(self.stacks))
+
+    def add(self,stack,seconds):
+        '''
+        :param stack: Phase names, outermost first.
+        :type stack: ``tuple`` of ``str``
+        :param seconds: Time spent in the innermost phase.
+        :type seconds: ``float``
+        '''
+        with self.lock:
+            self.stacks[stack] = self.stacks.get(stack,0.0)+seconds
+
+    def merge(self,other):
+        '''
+        Add the time from another profile into this one.
+
+        :param other: Profile to add.
+        :type other: :class:`redexpect.profiler.Profile`
+        '''
+        with other.lock:
+            stacks = list(other.stacks.items())
+        for (stack,seconds) in stacks:
+            self.add(stack,seconds)
+
+    def totals(self):
+        '''
+        :returns: ``dict`` - Seconds spent in each phase, keyed by the innermost phase name.
+        '''
+        totals = {}
+        with self.lock:
+            for (stack,seconds) in self.stacks.items():
+                totals[stack[-1]] = totals.get(stack[-1],0.0)+seconds
+        return(totals)
+
+    def folded(self):
+        '''
+        :returns: ``array`` of ``str`` - The profile as folded stacks, one ``phase;phase microseconds`` line per stack,
+                  as read by ``flamegraph.pl`` and most other flamegraph tools.
+        '''
+        with self.lock:
+            stacks = sorted(self.stacks.items())
+        return([';'.join(stack)+' '+str(int(round(seconds*1000000.0))) for (stack,seconds) in stacks])
+
+    def write_folded(self,fileobj):
+        '''
+        Write the profile as folded stacks, see :func:`redexpect.profiler.Profile.folded`.
+
+        :param fileobj: Text file to write to, or the path of one.
+        :type fileobj: ``file`` or ``str``
+        '''
+        if isinstance(fileobj,str):
+            with open(fileobj,'w') as folded_file:
+                return(self.write_folded(folded_file))
+        for line in self.folded():
+            fileobj.write(line+'\n')
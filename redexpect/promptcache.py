@@ -0,0 +1,85 @@
+# RedExpect
+# Copyright (C) 2018 - 2020  Red_M ( http://bitbucket.com/Red_M )
+
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+
+import os
+import json
+import tempfile
+import threading
+
+
+class PromptCache(object):
+    '''
+    Unique prompts found by :func:`redexpect.RedExpect.get_unique_prompt`, kept in a JSON file so later logins to the
+    same host as the same user can skip finding the prompt again, see the ``prompt_cache`` argument of :class:`redexpect.RedExpect`.
+
+    The file is read when the cache is created and written whenever a prompt is added or changes, merging in whatever
+    other processes have written to it since. Writes replace the file in one go so a reader never sees half of one.
+
+    :param path: Path of the JSON file, it is created if it doesn't exist.
+    :type path: ``str``
+    '''
+    def __init__(self,path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.prompts = self._load()
+
+    def __len__(self):
+        return(len(self.prompts))
+
+    def _key(self,key):
+        return(json.dumps([str(part) for part in key]))
+
+    def _load(self):
+        try:
+            with open(self.path) as cache_file:
+                return(json.load(cache_file))
+        except (IOError,OSError,ValueError):
+            return({})
+
+    def get(self,key):
+        '''
+        :param key: Key the prompt was saved under, eg ``(hostname, port, username, privilege)``.
+        :type key: ``tuple``
+        :returns: ``regex str`` - The saved prompt or ``None``.
+        '''
+        return(self.prompts.get(self._key(key)))
+
+    def put(self,key,prompt):
+        '''
+        Save a prompt.
+
+        :param key: Key to save the prompt under.
+        :type key: ``tuple``
+        :param prompt: The prompt regex.
+        :type prompt: ``regex str``
+        '''
+        key = self._key(key)
+        if self.prompts.get(key)==prompt:
+            return
+        with self.lock:
+            self.prompts = self._load()
+            self.prompts[key] = prompt
+            directory = os.path.dirname(os.path.abspath(self.path))
+            (fd,temp_path) = tempfile.mkstemp(dir=directory,prefix='.redexpect-prompts')
+            try:
+                with os.fdopen(fd,'w') as cache_file:
+                    json.dump(self.prompts,cache_file,indent=4,sort_keys=True)
+                os.replace(temp_path,self.path)
+            except BaseException:
+                os.unlink(temp_path)
+                raise
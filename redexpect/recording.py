@@ -0,0 +1,83 @@
+# RedExpect
+# Copyright (C) 2018 - 2020  Red_M ( http://bitbucket.com/Red_M )
+
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+
+import time
+import json
+import base64
+
+RECEIVED = 'received'
+SENT = 'sent'
+
+
+class Recorder(object):
+    '''
+    Writes the raw data of a session to a file as it is sent and received, along with when it happened,
+    so the session can be played back later by :class:`redexpect.transports.ReplayTransport`.
+    Start one with :func:`redexpect.session.ExpectSession.record`.
+
+    Each line of the file is a JSON object with the ``time`` in seconds since recording started,
+    the ``direction`` of either ``'received'`` or ``'sent'`` and the base64 encoded ``data``.
+
+    :param fileobj: Text file to write the recording to.
+    :type fileobj: ``file``
+    :param encoding: Encoding to write sent ``str`` as.
+    :type encoding: ``str``
+    '''
+    def __init__(self,fileobj,encoding='utf8'):
+        self.fileobj = fileobj
+        self.encoding = encoding
+        self.started = time.monotonic()
+
+    def received(self,data):
+        '''
+        Record raw data received from the remote end.
+        '''
+        self._write(RECEIVED,data)
+
+    def sent(self,data):
+        '''
+        Record data sent to the remote end.
+        '''
+        self._write(SENT,data)
+
+    def _write(self,direction,data):
+        if isinstance(data,str):
+            data = data.encode(self.encoding)
+        self.fileobj.write(json.dumps({
+            'time':round(time.monotonic()-self.started,6),
+            'direction':direction,
+            'data':base64.b64encode(data).decode('ascii')
+        })+'\n')
+        self.fileobj.flush()
+
+
+def load_recording(fileobj):
+    '''
+    Read a recording written by :class:`redexpect.recording.Recorder`.
+
+    :param fileobj: Text file to read the recording from.
+    :type fileobj: ``file``
+    :returns: ``array`` of ``tuple (float, str, bytes)`` - of ``(time, direction, data)`` for each chunk.
+    '''
+    recording = []
+    for line in fileobj:
+        if len(line.strip())==0:
+            continue
+        entry = json.loads(line)
+        recording.append((entry['time'],entry['direction'],base64.b64decode(entry['data'])))
+    return(recording)
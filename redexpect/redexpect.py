@@ -16,10 +16,10 @@
 # 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
 
 
-import os
 import time
-import re
+import select
 import redssh
+from redssh import libssh2
 
 redssh.RedSSH.connect.__doc__ = '''
     .. warning::
@@ -27,199 +27,205 @@ redssh.RedSSH.connect.__doc__ = '''
 '''
 
 from redexpect import exceptions
+from redexpect import metrics
+from redexpect import result
+from redexpect import session
 
-class RedExpect(redssh.RedSSH):
+EXEC_READ_SIZE = 65536
+
+class RedExpect(redssh.RedSSH,session.ExpectSession):
     '''
     Instances the start of an SSH connection.
     Extra options are available after :func:`redexpect.RedExpect.login` is called.
     This only takes the arguements below and the rest are defered to :class:`redssh.RedSSH`.
 
     Please also note that this class inherits from :class:`redssh.RedSSH` and tries to not override anything from that.
+    The expect side comes from :class:`redexpect.session.ExpectSession`, this class only connects it to the SSH channel.
 
     :param prompt: The basic prompt to expect for the first command line.
     :type prompt: ``regex string``
-    :param encoding: Set the encoding to something other than the default of ``'utf16'`` when your target SSH server doesn't return UTF-16.
+    :param encoding: Set the encoding to something other than the default of ``'utf8'`` when your target SSH server doesn't return UTF-8.
+                     Output is decoded incrementally so characters split across reads are decoded correctly.
     :type encoding: ``str``
+    :param encoding_errors: How to handle output that can't be decoded, passed to :func:`codecs.getincrementaldecoder`.
+    :type encoding_errors: ``str``
+    :param bytes_mode: Set to ``True`` to match and return ``bytes`` without decoding output at all, useful for ASCII only network devices.
+                       Regex strings are encoded as latin-1 to match against ``bytes``.
+    :type bytes_mode: ``bool``
     :param newline: Set the newline for sending and recieving text to the remote server.
     :type newline: ``str``
     :param expect_timeout: Set the timeout in seconds for when expecting a certain string to appear, this means that the string or regex has to be matched within this time. Set to ``0`` to disable.
     :type expect_timeout: ``float``
+    :param expect_lookbehind: Amount of characters of already received output that are searched again when new output arrives, see :class:`redexpect.matcher.StreamMatcher`.
+    :type expect_lookbehind: ``int``
+    :param expect_wait_interval: Longest time in seconds to sleep on the socket waiting for data while expecting, set to ``0`` to poll for data without sleeping.
+    :type expect_wait_interval: ``float``
+    :param expect_max_buffer: Most amount of characters of output to hold while expecting, past this :class:`redexpect.exceptions.BufferOverflow` is raised. Set to ``0`` to disable.
+    :type expect_max_buffer: ``int``
+    :param expect_ring_buffer: Set to ``True`` to throw away the oldest output past ``expect_max_buffer`` and keep expecting over the rest instead of raising.
+    :type expect_ring_buffer: ``bool``
+    :param prompt_cache: Cache of unique prompts shared between sessions, or the path of the file to keep one in, so
+                         logins can skip finding the prompt when it hasn't changed, see :func:`redexpect.RedExpect.set_unique_prompt`.
+                         :func:`redexpect.RedExpect.login` keys it on ``(hostname, port, username)``.
+    :type prompt_cache: :class:`redexpect.promptcache.PromptCache` or ``str``
+    :param metrics: Where to report how long each phase of the session takes and how much data it moves, ``None`` to not report them.
+    :type metrics: :class:`redexpect.metrics.Metrics`
+    :param profile: Set to ``True`` to add up the time each expect spends reading, decoding, cleaning and searching
+                    output in :var:`redexpect.RedExpect.profile`, or a profile to add it to, eg one shared by a whole fleet run.
+                    This costs a few timer calls per chunk read so it is off by default.
+    :type profile: ``bool`` or :class:`redexpect.profiler.Profile`
+    :param out_sink: Function called with each piece of raw data read, by :func:`redexpect.RedExpect.out_feed`.
+                     Use a :class:`redexpect.sinks.BatchedSink` for anything slow, such as writing transcripts, so it is
+                     done in a background thread instead of while expecting.
+    :type out_sink: ``function`` or :class:`redexpect.sinks.BatchedSink`
     '''
-    def __init__(self,prompt=r'.+?[\#\$]\s+',encoding='utf8',newline='\r',expect_timeout=300.0,**kwargs):
-        super().__init__(**kwargs)
-        self.debug = False
-        self.encoding = encoding
-        self.basic_prompt = prompt
-        self.prompt_regex = prompt
-        self.prompt_regex_SET_SH = r"PS1='[REDEXPECT]\$ '"
-        self.prompt_regex_SET_CSH = r"set prompt='[REDEXPECT]\$ '"
-        self.current_send_string = ''
-        self.current_output = ''
-        self.current_output_clean = ''
-        self.newline = newline
-        self.expect_timeout = expect_timeout
+    def __init__(self,prompt=r'.+?[\#\$]\s+',encoding='utf8',newline='\r',expect_timeout=300.0,expect_lookbehind=4096,expect_wait_interval=0.1,encoding_errors='strict',bytes_mode=False,expect_max_buffer=0,expect_ring_buffer=False,prompt_cache=None,metrics=None,profile=False,out_sink=None,**kwargs):
+        redssh.RedSSH.__init__(self,**kwargs)
+        session.ExpectSession.__init__(self,prompt=prompt,encoding=encoding,newline=newline,expect_timeout=expect_timeout,
+            expect_lookbehind=expect_lookbehind,expect_wait_interval=expect_wait_interval,encoding_errors=encoding_errors,bytes_mode=bytes_mode,
+            expect_max_buffer=expect_max_buffer,expect_ring_buffer=expect_ring_buffer,prompt_cache=prompt_cache,metrics=metrics,profile=profile,out_sink=out_sink)
 
     def __check_for_attr__(self,attr):
         return(attr in self.__dict__)
 
-    def device_init(self,**kwargs):
-        '''
-        Override this function to intialize a device that does not simply drop to the terminal or a device will kick you out if you send any key/character other than an "acceptable" one.
-        This default one will work on linux quite well but devices such as pfsense or mikrotik might require this function and :func:`redexpect.RedExpect.get_unique_prompt` to be overriden.
-        '''
-        pass
-
-    def login(self,*args,auto_unique_prompt=True,**kwargs):
+    def login(self,*args,auto_unique_prompt=True,disable_paging=False,disable_echo=False,**kwargs):
         '''
         This uses :class:`redssh.RedSSH.connect` to connect and then login to a remote host.
-        This only takes a single optional arguement and the rest are defered to :class:`redssh.RedSSH.connect`.
+        This only takes these optional arguements and the rest are defered to :class:`redssh.RedSSH.connect`.
 
         :param auto_unique_prompt: Automatically set a unique prompt to search for once logged into the remote server.
         :type auto_unique_prompt: ``float``
+        :param disable_paging: Set to ``True`` to turn off the remote end's pager once logged in, see :func:`redexpect.RedExpect.disable_paging`.
+        :type disable_paging: ``bool``
+        :param disable_echo: Set to ``True`` to stop the remote terminal echoing commands back once logged in, see :func:`redexpect.RedExpect.disable_echo`.
+        :type disable_echo: ``bool``
         '''
+        started = time.monotonic()
         self.connect(*args,**kwargs)
-        self.device_init()
-        self.prompt()
-        if auto_unique_prompt==True:
-            self.set_unique_prompt()
-
-    def sendline_raw(self,string):
-        '''
-        Use this when you want to directly interact with the remote session.
-
-        :param string: String to send to the remote session.
-        :type string: ``str``
+        self.metrics.timing(metrics.CONNECT,time.monotonic()-started)
+        self._logged_in_as(args,kwargs)
+        self.start(auto_unique_prompt=auto_unique_prompt,disable_paging=disable_paging,disable_echo=disable_echo)
+
+    def _logged_in_as(self,args,kwargs):
+        # Keys the prompt cache on the arguments of connect() that say who is logged in where.
+        connect_args = dict(zip(('hostname','port','username'),args))
+        connect_args.update(kwargs)
+        self.prompt_cache_key = (connect_args.get('hostname'),connect_args.get('port',22),connect_args.get('username',''))
+        self.privilege = None
+
+    def exec_command(self,cmd,timeout=None):
         '''
-        self.send(string)
+        Run a command that doesn't need the shell on a channel of its own, see :func:`redexpect.RedExpect.exec_commands`.
 
-    def sendline(self,send_string,newline=None):
-        '''
-        Saves and sends the send string provided to the remote session with a newline added.
-
-        :param send_string: String to send to the remote session.
-        :type send_string: ``str``
-        :param newline: Override the newline character sent to the remote session.
-        :type newline: ``str``
-        '''
-        self.current_send_string = send_string
-        if newline==None:
-            newline = self.newline
-        self.sendline_raw(send_string+newline)
-
-    def remote_text_clean(self,string,strip_ansi=True):
-        string = string.replace('\r','')
-        if strip_ansi==True:
-            string = re.sub(r'\x1b\[([0-9,A-Z]{1,2}(;[0-9]{1,2})?(;[0-9]{3})?)?[m|K]?','',string)
-        return(string)
-
-    def get_unique_prompt(self):
-        '''
-        Return a unique prompt from the existing SSH session. Override this function to generate the compiled regex however you'd like, eg, from a database or from a hostname.
-
-        :returns: compiled ``regex str``
+        :param cmd: Command to execute.
+        :type cmd: ``str``
+        :param timeout: Set the timeout for the command to finish within, if set to ``None`` this will use the value of :var:`redexpect.RedExpect.expect_timeout`.
+        :type timeout: ``float``
+        :returns: :class:`redexpect.result.ExecResult`
+        :raises: :class:`redexpect.exceptions.ExpectTimeout` if the timeout has been reached.
+        :raises: :class:`redexpect.exceptions.ChannelReadError` if reading the command's output fails.
         '''
-        return(re.escape(self.command('',clean_output=False)[1:])) # A smart-ish way to get the current prompt after a dumb prompt match
+        return(self.exec_commands([cmd],timeout=timeout)[0])
 
-    def set_unique_prompt(self,use_basic_prompt=True,set_prompt=False):
+    def exec_commands(self,cmds,timeout=None,max_channels=8):
         '''
-        Set a unique prompt in the existing SSH session.
+        Run commands that don't need the shell, its state, a prompt or privileges from :func:`redexpect.RedExpect.sudo`,
+        each on a channel of its own over the existing connection without a PTY. There is no echo, terminal escape
+        sequences or prompt to match so stdout, stderr and the exit status are returned as they are, and the
+        interactive shell is left untouched.
 
-        :param use_basic_prompt: Use the dumb prompt from first login to the remote terminal.
-        :type use_basic_prompt: ``bool``
-        :param set_prompt: Set to ``True`` to set the prompt via :var:`redexpect.RedExpect.PROMPT_SET_SH`
-        :type set_prompt: ``bool``
-        '''
-        if use_basic_prompt==True:
-            self.prompt_regex = self.basic_prompt
-        if set_prompt==True:
-            self.command(self.prompt_regex_SET_SH)
-        self.prompt_regex = self.get_unique_prompt()
+        The commands run concurrently, each channel is started as soon as one of the ``max_channels`` is free and all
+        of the running ones are read from as their output arrives.
 
-    def prompt(self,additional_matches=[],timeout=None):
+        :param cmds: Commands to execute.
+        :type cmds: ``array`` of ``str``
+        :param timeout: Set the timeout for all of the commands to finish within, if set to ``None`` this will use the value of :var:`redexpect.RedExpect.expect_timeout`.
+        :type timeout: ``float``
+        :param max_channels: Most amount of channels to have open at once, SSH servers limit this, eg OpenSSH's ``MaxSessions`` defaults to 10.
+        :type max_channels: ``int``
+        :returns: ``array`` of :class:`redexpect.result.ExecResult` in the same order as ``cmds``.
+        :raises: :class:`redexpect.exceptions.ExpectTimeout` if the timeout has been reached.
+        :raises: :class:`redexpect.exceptions.ChannelReadError` if reading a command's output fails.
         '''
-        Get a command line prompt in the terminal.
-        Useful for using :func:`redexpect.RedExpect.sendline` to send commands
-        then using this for when you want to get back to a prompt to enter further commands.
-
-        :param additional_matches: Additional matches to count as a prompt.
-        :type additional_matches: ``arr``
-        :param timeout: Timeout for the prompt to be reached.
-        :type timeout: ``float`` or ``int``
-        :raises: :class:`redexpect.exceptions.ExpectTimeout` if the timeout for expect has been reached.
-        :returns: ``int`` - Match number, ``0`` is always the prompt defined for the session.
+        run = self._exec_run(cmds,timeout,max_channels)
+        while self._exec_step(run)==False:
+            if run.progressed==False:
+                RedExpect.wait_for_data(self,self._exec_wait_time(run))
+        return(run.results)
+
+    def _exec_run(self,cmds,timeout,max_channels):
+        return(_ExecRun(cmds,self._expect_deadline(timeout),max_channels))
+
+    def _exec_step(self,run):
+        # Starts channels while there is room, reads what every running channel has received and closes finished ones.
+        # Returns True once all of the commands have finished.
+        while len(run.pending)>0 and len(run.running)<run.max_channels:
+            (index,cmd) = run.pending.pop(0)
+            started = time.monotonic()
+            channel = self._block(self.session.open_session)
+            self._block(channel.execute,cmd)
+            run.running.append(_ExecChannel(index,cmd,channel,started))
+        # Reading one channel can pull data for the others off the socket, so look again before waiting on the socket.
+        run.progressed = self._exec_read(run) or self._exec_read(run)
+        return(len(run.pending)==0 and len(run.running)==0)
+
+    def _exec_read(self,run):
+        progressed = False
+        for exec_channel in list(run.running):
+            with self._block_lock:
+                (size,data) = exec_channel.channel.read(EXEC_READ_SIZE)
+                (stderr_size,stderr_data) = exec_channel.channel.read_stderr(EXEC_READ_SIZE)
+                eof = exec_channel.channel.eof()
+            for error_code in (size,stderr_size):
+                if error_code<0 and error_code!=libssh2.LIBSSH2_ERROR_EAGAIN:
+                    run.running.remove(exec_channel)
+                    raise(exceptions.ChannelReadError(exec_channel.cmd,error_code))
+            if size>0:
+                exec_channel.stdout.append(data[:size])
+            if stderr_size>0:
+                exec_channel.stderr.append(stderr_data[:stderr_size])
+            if size>0 or stderr_size>0:
+                progressed = True
+            elif eof==True:
+                run.running.remove(exec_channel)
+                run.results[exec_channel.index] = self._exec_finish(exec_channel)
+                progressed = True
+        return(progressed)
+
+    def _exec_finish(self,exec_channel):
+        self._block(exec_channel.channel.close)
+        exit_status = self._block(exec_channel.channel.get_exit_status)
+        (stdout,stderr) = (b''.join(exec_channel.stdout),b''.join(exec_channel.stderr))
+        if self.bytes_mode==False:
+            (stdout,stderr) = (stdout.decode(self.encoding,self.encoding_errors),stderr.decode(self.encoding,self.encoding_errors))
+        return(result.ExecResult(exec_channel.cmd,stdout,stderr,exit_status,exec_channel.started,time.monotonic()))
+
+    def _exec_wait_time(self,run):
+        wait = self.expect_wait_interval
+        if run.deadline!=None:
+            remaining = run.deadline-time.monotonic()
+            if remaining<0:
+                raise(exceptions.ExpectTimeout([exec_channel.cmd for exec_channel in run.running]))
+            wait = min(wait,remaining)
+        return(wait)
+
+    def wait_for_data(self,timeout):
         '''
-        if not isinstance(additional_matches,type([])):
-            additional_matches = [additional_matches]
-        return(self.expect([self.prompt_regex]+additional_matches,timeout=timeout))
+        Sleep on the SSH session's socket until the remote server sends data or ``timeout`` seconds pass.
+        Used by :func:`redexpect.RedExpect.expect` when a read returned nothing, instead of polling for data again straight away.
 
-    def expect(self,re_strings='',default_match_prefix='',strip_ansi=True,timeout=None):
-        '''
-        This function takes in a regular expression (or regular expressions)
-        that represent the last line of output from the server. The function
-        waits for one or more of the terms to be matched. The regexes are
-        matched using expression ``r'\\n<regex>$'`` so you'll need to provide an
-        easygoing regex such as ``'.*server.*'`` if you wish to have a fuzzy
-        match.
-
-        This has been originally taken from paramiko_expect and modified to work with RedExpect.
-        I've also made the style consistent with the rest of the library.
-
-        :param re_strings: Either a regex string or list of regex strings
-                           that we should expect; if this is not specified,
-                           then ``EOF`` is expected (i.e. the shell is completely
-                           closed after the exit command is issued)
-        :type re_strings: ``array`` or ``regex str``
-        :param default_match_prefix: A prefix to all match regexes, defaults to ``''``.
-                                     Useful for making sure you have a prefix to match the start of a prompt.
-        :type default_match_prefix: ``str``
-        :param strip_ansi: If ``True``, will strip ansi control chars befores regex matching.
-        :type strip_ansi: ``bool``
-        :param timeout: Set the timeout for this finish blocking within, setting to ``None`` takes the value from :var:`redexpect.RedExpect.expect_timeout` which can be set at first instance, set to ``0`` to disable.
+        :param timeout: Longest time in seconds to sleep for.
         :type timeout: ``float``
-        :return: ``int`` - An ``EOF`` returns ``-1``, a regex metch returns ``0`` and a match in a
-                 list of regexes returns the index of the matched string in
-                 the list.
-        :raises: :class:`redexpect.exceptions.ExpectTimeout` if the timeout for expect has been reached.
         '''
-        current_output = ''
-
-        if isinstance(re_strings,str) and len(re_strings)!=0:
-            re_strings = [re_strings]
-
-        time_started = time.time()
-        if timeout==None:
-            timeout = self.expect_timeout
-
-        while (len(re_strings)==0 or not [re_string for re_string in re_strings if re.search(default_match_prefix+re_string,current_output,re.DOTALL)]):
-            for current_buffer in self.read():
-                if current_buffer==None:
-                    return(-1)
-                # print(current_buffer)
-                current_buffer_decoded = str(self.remote_text_clean(current_buffer.decode(self.encoding),strip_ansi=strip_ansi))
-                # print(current_buffer_decoded)
-                current_output += current_buffer_decoded
-            if float(time.time()-time_started)>timeout and timeout!=0:
-                raise(exceptions.ExpectTimeout(re_strings))
-
-        if len(re_strings)!=0:
-            found_pattern = [(re_index,re_string) for (re_index,re_string) in enumerate(re_strings) if re.search(default_match_prefix+re_string,current_output,re.DOTALL)]
-
-        self.current_output = current_output
-        current_output_clean = str(current_output) # memcopy hack
-
-        if len(self.current_send_string)!=0:
-            current_output_clean = current_output_clean.replace(self.current_send_string+'\n','')
-        self.current_send_string = ''
-
-        if len(re_strings)!=0 and len(found_pattern)!=0:
-            # print(current_output_clean)
-            self.current_output_clean = re.sub(found_pattern[0][1],'',current_output_clean)
-            self.last_match = found_pattern[0][1]
-            return(found_pattern[0][0])
-        # else:
-            # return(-1)
-        # If someone manages to get a ``None`` instead of a -1 please open an issue.
-        # I want to know how you did that so I can write a test for it :)
+        if self.__check_for_attr__('past_login')==False:
+            time.sleep(timeout)
+            return
+        with self._block_lock:
+            block_direction = self.session.block_directions()
+        wfds = []
+        if block_direction & libssh2.LIBSSH2_SESSION_BLOCK_OUTBOUND:
+            wfds = [self.sock]
+        select.select([self.sock],wfds,[],timeout)
 
     def read(self,block=False):
         gen = super().read(block)
@@ -229,67 +235,23 @@ class RedExpect(redssh.RedSSH):
             self.out_feed(data)
             yield(data)
 
-    def out_feed(self,raw_data):
-        '''
-        Override to get the raw data from the remote machine into a function.
-
-        Useful as a way to get data from the ``expect()`` to another library without impacting the expect side.
-        '''
-        pass
-
-    def command(self,cmd,clean_output=True,remove_newline=False,timeout=None):
-        '''
-        Run a command in the remote terminal.
-
-        :param cmd: Command to execute, this will send characters exactly as if they were typed. (crtl+c could be sent via this).
-        :type cmd: ``str``
-        :param clean_output: Set to ``False`` to remove the "smart" cleaning, useful for debugging or for when you want the prompt as well.
-        :type clean_output: ``bool``
-        :param remove_newline: Set to ``True`` to remove the last newline on a return, useful when a command adds a newline to its output.
-        :type remove_newline: ``bool``
-        :param timeout: Set the timeout for this command to complete within, if set to ``None`` this will use the value of :var:`redexpect.RedExpect.expect_timeout` which can be set at first instance.
-        :type timeout: ``float``
-
-        :returns: ``str``
-        :raises: :class:`redexpect.exceptions.ExpectTimeout` if the timeout for expect has been reached.
-        '''
-        self.sendline(cmd)
-        self.prompt(timeout=timeout)
-        if clean_output==True:
-            out = str(self.current_output_clean)
-        else:
-            out = str(self.current_output)
-        if remove_newline==True:
-            while out.endswith('\n') or out.endswith('\r'):
-                out = out[:-1]
-        return(out)
-
-
-    def sudo(self,password,sudo=True,su_cmd='su -'):
-        '''
-        Sudo up or SU up or whatever up, into higher privileges.
-
-        :param password: Password for gaining privileges
-        :type password: ``str``
-        :param sudo: Set to ``False`` to allow ``su_cmd`` to be executed instead.
-        :type sudo: ``bool``
-        :param su_cmd: Command to be executed when ``sudo`` is ``False``, allows overriding of the ``'sudo'`` default.
-        :type su_cmd: ``str``
-        :return: ``None``
-        :raises: :class:`redexpect.exceptions.BadSudoPassword` if the password provided does not allow for privilege escalation.
-        '''
-        cmd = su_cmd
-        password_line = r'.+?asswor.+?\:\s+'
-        if sudo==True:
-            cmd = 'sudo '+su_cmd
-        self.sendline(cmd)
-        self.expect(password_line)
-        self.sendline_raw(password+self.newline)
-        acceptable_response = [self.basic_prompt]
-        bad_response = [password_line,r'Sorry.+?\.',r'.+?Authentication failure']
-        result = self.expect(re_strings=bad_response+acceptable_response) # Might be an idea to allow extra failure strings here to be more platform agnostic
-        if result>=len(bad_response)-1:
-            self.set_unique_prompt()
-        else:
-            raise(exceptions.BadSudoPassword())
 
+class _ExecRun(object):
+    # State of a call to exec_commands(), kept apart from the session so the async version can share the steps.
+    def __init__(self,cmds,deadline,max_channels):
+        self.pending = list(enumerate(cmds))
+        self.running = []
+        self.results = [None]*len(cmds)
+        self.deadline = deadline
+        self.max_channels = max_channels
+        self.progressed = False
+
+
+class _ExecChannel(object):
+    def __init__(self,index,cmd,channel,started):
+        self.index = index
+        self.cmd = cmd
+        self.channel = channel
+        self.started = started
+        self.stdout = []
+        self.stderr = []
@@ -0,0 +1,141 @@
+# RedExpect
+# Copyright (C) 2018 - 2020  Red_M ( http://bitbucket.com/Red_M )
+
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+
+def clean(output,echoes,cleaner):
+    '''
+    Remove echoed send strings and the text matched by ``cleaner`` from output.
+
+    :param output: Output from the remote session.
+    :type output: ``str`` or ``bytes``
+    :param echoes: Echoes to remove, of the same type as ``output``.
+    :type echoes: ``array``
+    :param cleaner: Compiled regex of what to remove, usually the prompt.
+    :type cleaner: ``re.Pattern``
+    :returns: ``str`` or ``bytes``
+    '''
+    for echo in echoes:
+        output = output.replace(echo,output[:0])
+    return(cleaner.sub(output[:0],output))
+
+
+class CommandResult(object):
+    '''
+    Everything about a single :func:`redexpect.RedExpect.expect` match, as returned by :func:`redexpect.RedExpect.command`
+    with ``result=True`` and kept in :var:`redexpect.RedExpect.last_result`.
+
+    Only the output as it was matched is stored, the cleaned output is worked out the first time
+    :var:`redexpect.result.CommandResult.clean` is used and cached from then on.
+
+    :var output: Output up to and including the match, ``bytes`` when :var:`redexpect.RedExpect.bytes_mode` is set.
+    :var match_start: Offset of the match in the output.
+    :var match: The ``re.Match`` object.
+    :var index: Index of the regex that matched.
+    :var re_string: The regex that matched.
+    :var started: ``time.monotonic()`` of when the command was sent, or when expecting started.
+    :var finished: ``time.monotonic()`` of when the match was found.
+    :var exit_status: Exit status of the command when it was run with ``capture_status``, otherwise ``None``.
+    '''
+    __slots__ = ('output','match_start','match','index','re_string','started','finished','exit_status','echoes','cleaner','_clean')
+
+    def __init__(self,output,match_start,match,index,re_string,echoes=(),cleaner=None,started=0.0,finished=0.0,exit_status=None):
+        self.output = output
+        self.match_start = match_start
+        self.match = match
+        self.index = index
+        self.re_string = re_string
+        self.echoes = echoes
+        self.cleaner = cleaner
+        self.started = started
+        self.finished = finished
+        self.exit_status = exit_status
+        self._clean = None
+
+    def __repr__(self):
+        return('CommandResult('+str(self.index)+', '+str(len(self.output))+' characters, '+str(round(self.duration,3))+'s)')
+
+    @property
+    def before(self):
+        '''
+        :returns: ``str`` or ``bytes`` - Output before the match.
+        '''
+        return(self.output[:self.match_start])
+
+    @property
+    def after(self):
+        '''
+        :returns: ``str`` or ``bytes`` - The matched text.
+        '''
+        return(self.output[self.match_start:])
+
+    @property
+    def span(self):
+        '''
+        :returns: ``tuple (int, int)`` - Start and end of the match in the output.
+        '''
+        return((self.match_start,len(self.output)))
+
+    @property
+    def duration(self):
+        '''
+        :returns: ``float`` - Seconds from start to match.
+        '''
+        return(self.finished-self.started)
+
+    @property
+    def clean(self):
+        '''
+        :returns: ``str`` or ``bytes`` - Output without the echoed command and the matched prompt.
+        '''
+        if self._clean==None:
+            if self.cleaner==None:
+                self._clean = self.output
+            else:
+                self._clean = clean(self.output,self.echoes,self.cleaner)
+        return(self._clean)
+
+
+class ExecResult(object):
+    '''
+    Outcome of a command run on its own channel by :func:`redexpect.RedExpect.exec_command`.
+
+    :var cmd: The command.
+    :var stdout: Everything the command wrote to stdout, ``bytes`` when :var:`redexpect.RedExpect.bytes_mode` is set.
+    :var stderr: Everything the command wrote to stderr, ``bytes`` when :var:`redexpect.RedExpect.bytes_mode` is set.
+    :var exit_status: The command's exit status.
+    :var started: ``time.monotonic()`` of when the channel was opened.
+    :var finished: ``time.monotonic()`` of when the channel was closed.
+    '''
+    __slots__ = ('cmd','stdout','stderr','exit_status','started','finished')
+
+    def __init__(self,cmd,stdout,stderr,exit_status,started=0.0,finished=0.0):
+        self.cmd = cmd
+        self.stdout = stdout
+        self.stderr = stderr
+        self.exit_status = exit_status
+        self.started = started
+        self.finished = finished
+
+    def __repr__(self):
+        return('ExecResult('+repr(self.cmd)+', '+str(self.exit_status)+')')
+
+    @property
+    def duration(self):
+        '''
+        :returns: ``float`` - Seconds from opening the channel to closing it.
+        '''
+        return(self.finished-self.started)
@@ -0,0 +1,1004 @@
+# RedExpect
+# Copyright (C) 2018 - 2020  Red_M ( http://bitbucket.com/Red_M )
+
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+
+import time
+import re
+import uuid
+import functools
+
+from redexpect import engine
+from redexpect import exceptions
+from redexpect import metrics
+from redexpect import profiler
+from redexpect import patterns
+from redexpect import promptcache
+from redexpect import recording
+from redexpect import result
+from redexpect.spool import SpooledOutput
+from redexpect.metrics import NULL_METRICS
+
+
+class ExpectSession(object):
+    '''
+    The expect, prompt and command logic of :class:`redexpect.RedExpect` without any transport attached.
+
+    Subclasses connect it to a transport by providing three functions:
+
+    * ``read()`` - returns an iterable of ``bytes`` received so far without waiting, a ``None`` in it means the remote end has closed.
+    * ``send(string)`` - sends a ``str`` to the remote end.
+    * ``wait_for_data(timeout)`` - sleeps until there is more to read or ``timeout`` seconds pass.
+
+    Matching is done by a :class:`redexpect.engine.ExpectEngine`, so none of it depends on how data arrives.
+    See :class:`redexpect.RedExpect` for SSH and :class:`redexpect.transports.TransportSession` for other transports.
+    This takes the same arguments as :class:`redexpect.RedExpect` apart from the ones for :class:`redssh.RedSSH`.
+    '''
+    def __init__(self,prompt=r'.+?[\#\$]\s+',encoding='utf8',newline='\r',expect_timeout=300.0,expect_lookbehind=4096,expect_wait_interval=0.1,encoding_errors='strict',bytes_mode=False,expect_max_buffer=0,expect_ring_buffer=False,prompt_cache=None,metrics=None,profile=False,out_sink=None):
+        self.debug = False
+        self.encoding = encoding
+        self.encoding_errors = encoding_errors
+        self.bytes_mode = bytes_mode
+        self.engine = engine.ExpectEngine(encoding=encoding,encoding_errors=encoding_errors,bytes_mode=bytes_mode,lookbehind=expect_lookbehind,
+            max_buffer=expect_max_buffer,ring_buffer=expect_ring_buffer)
+        self.basic_prompt = prompt
+        self.prompt_regex = prompt
+        self.prompt_regex_SET_SH = r"PS1='[REDEXPECT]\$ '"
+        self.prompt_regex_SET_CSH = r"set prompt='[REDEXPECT]\$ '"
+        self.status_echo_SH = 'echo {}_$?'
+        self.status_echo_CSH = 'echo {}_$status'
+        self.status_echo = self.status_echo_SH
+        self.pager_prompts = [r' *-- ?[Mm]ore ?-- *',r'<--- More --->',r'Press any key to continue[^\n]*']
+        self.pager_response = ' '
+        self.pager_erase = r'[ \x08]*\x08'
+        self.paging_commands = ['terminal length 0','stty rows 0','set cli screen-length 0']
+        self.remote_echo = True
+        self.echo_disable_command = 'stty -echo'
+        self.paging_errors = [r'% ?Invalid',r'[Uu]nknown',r'[Uu]nrecognized',r'not found',r'[Ss]yntax error',r'[Ee]rror:']
+        self.current_send_string = ''
+        self.last_result = None
+        self.last_match = None
+        self.newline = newline
+        self.expect_timeout = expect_timeout
+        self.expect_lookbehind = expect_lookbehind
+        self.expect_wait_interval = expect_wait_interval
+        self.expect_max_buffer = expect_max_buffer
+        self.expect_ring_buffer = expect_ring_buffer
+        self.expect_deadline = None
+        self.expect_started = 0.0
+        if isinstance(prompt_cache,str):
+            prompt_cache = promptcache.PromptCache(prompt_cache)
+        self.prompt_cache = prompt_cache
+        self.prompt_cache_key = None
+        self.privilege = None
+        self.metrics = metrics
+        if self.metrics==None:
+            self.metrics = NULL_METRICS
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.chunks_read = 0
+        self.sent_at = None
+        self.first_byte_at = None
+        self.reported_counts = {}
+        if profile==True:
+            profile = profiler.Profile()
+        elif profile==False:
+            profile = None
+        self.profile = profile
+        self.out_sink = out_sink
+        self.recorder = None
+        self.spooled = None
+
+    def read(self):
+        raise(NotImplementedError())
+
+    def send(self,string):
+        raise(NotImplementedError())
+
+    def wait_for_data(self,timeout):
+        '''
+        Sleep until the remote end sends data or ``timeout`` seconds pass.
+        Used by :func:`redexpect.session.ExpectSession.expect` when a read returned nothing, instead of polling for data again straight away.
+
+        :param timeout: Longest time in seconds to sleep for.
+        :type timeout: ``float``
+        '''
+        time.sleep(timeout)
+
+    def device_init(self,**kwargs):
+        '''
+        Override this function to intialize a device that does not simply drop to the terminal or a device will kick you out if you send any key/character other than an "acceptable" one.
+        This default one will work on linux quite well but devices such as pfsense or mikrotik might require this function and :func:`redexpect.RedExpect.get_unique_prompt` to be overriden.
+        '''
+        pass
+
+    def start(self,auto_unique_prompt=True,disable_paging=False,disable_echo=False):
+        '''
+        Get to the first prompt of a freshly connected transport, this is what :func:`redexpect.RedExpect.login` does after connecting.
+
+        :param auto_unique_prompt: Automatically set a unique prompt to search for once at the first prompt.
+        :type auto_unique_prompt: ``bool``
+        :param disable_paging: Set to ``True`` to run :func:`redexpect.RedExpect.disable_paging` once at the first prompt.
+        :type disable_paging: ``bool``
+        :param disable_echo: Set to ``True`` to run :func:`redexpect.RedExpect.disable_echo` once at the first prompt.
+        :type disable_echo: ``bool``
+        '''
+        return(self._run(self._start_steps(auto_unique_prompt,disable_paging,disable_echo)))
+
+    # The _*_steps functions hold the flows that wait on the remote end as generators that yield each call that waits,
+    # see _run(), so that sync and async sessions share them and only differ in how they wait.
+    def _start_steps(self,auto_unique_prompt,disable_paging,disable_echo):
+        self.engine.reset()
+        started = time.monotonic()
+        yield(self.device_init)
+        yield(self.prompt)
+        yield from self._discard_banner_steps()
+        self.metrics.timing(metrics.DEVICE_INIT,time.monotonic()-started)
+        if auto_unique_prompt==True:
+            yield(self.set_unique_prompt)
+        if disable_paging==True:
+            yield(self.disable_paging)
+        if disable_echo==True:
+            yield(self.disable_echo)
+
+    def _discard_banner_steps(self):
+        # The basic prompt can match inside a login banner, eg one with '# ' in it. Output left after the match means
+        # that happened, so the rest of the banner and the real prompt are read and thrown away until nothing more
+        # arrives for expect_wait_interval, so they aren't taken for the reply to what is sent next.
+        while len(self.engine.buffer)!=0:
+            self.engine.discard()
+            yield(functools.partial(self._wait,self.expect_wait_interval))
+            for current_buffer in self._read():
+                if current_buffer==None:
+                    return
+                self._expect_feed(current_buffer,True)
+
+    def _run(self,steps):
+        # Calls each function the steps yield and sends back what it returned, until the steps return.
+        value = None
+        while True:
+            try:
+                step = steps.send(value)
+            except StopIteration as stop:
+                return(stop.value)
+            value = None
+            if step!=None:
+                value = step()
+
+    def disable_echo(self):
+        '''
+        Stop the remote terminal from echoing back what is sent with :var:`redexpect.RedExpect.echo_disable_command`,
+        which halves the traffic of sending large scripts and lets output be returned without searching it for the
+        echoed command, so output that happens to contain the command is left alone.
+
+        Whether it worked is checked by sending a shell comment and looking for it in the output. If it comes back the
+        device can't turn echo off and :var:`redexpect.RedExpect.remote_echo` is left as ``True``, so echoes are still removed.
+
+        :returns: ``bool`` - ``True`` if echo is now off.
+        '''
+        return(self._run(self._disable_echo_steps()))
+
+    def _disable_echo_steps(self):
+        yield(functools.partial(self.command,self.echo_disable_command))
+        echo_check = self._echo_check()
+        self.remote_echo = self.native(echo_check) in (yield(functools.partial(self.command,echo_check,clean_output=False)))
+        return(self.remote_echo==False)
+
+    def _echo_check(self):
+        # A comment does nothing on a shell and has nothing else in the output it could be confused with.
+        return('# REDEXPECT'+uuid.uuid4().hex[:16])
+
+    def disable_paging(self,commands=None):
+        '''
+        Try to turn off the remote end's pager so long output arrives in one stream, instead of a page at a time with
+        a round trip to answer each pager prompt. The commands are tried in order until one runs without printing
+        anything matching :var:`redexpect.RedExpect.paging_errors`.
+        This has to be run at a prompt, so from :func:`redexpect.RedExpect.start` rather than :func:`redexpect.RedExpect.device_init`.
+
+        :param commands: Commands to try, ``None`` to use :var:`redexpect.RedExpect.paging_commands`, which covers
+                         Cisco/Arista style ``terminal length 0``, ``stty`` on Unix shells and Juniper.
+        :type commands: ``array`` of ``str``
+        :returns: ``str`` - The command that worked, or ``None`` if none of them did.
+        '''
+        return(self._run(self._disable_paging_steps(commands)))
+
+    def _disable_paging_steps(self,commands):
+        if commands==None:
+            commands = self.paging_commands
+        paging_errors = self.engine.compile(self.paging_errors)
+        for cmd in commands:
+            if paging_errors.search((yield(functools.partial(self.command,cmd))))==None:
+                return(cmd)
+        return(None)
+
+    def record(self,fileobj):
+        '''
+        Record everything sent and received from now on, to be played back by :class:`redexpect.transports.ReplayTransport`.
+        Received data is recorded as it is read by :func:`redexpect.RedExpect.expect`.
+
+        :param fileobj: Text file to write the recording to, see :class:`redexpect.recording.Recorder` for the format.
+        :type fileobj: ``file``
+        :returns: :class:`redexpect.recording.Recorder`
+        '''
+        self.recorder = recording.Recorder(fileobj,encoding=self.encoding)
+        return(self.recorder)
+
+    def sendline_raw(self,string):
+        '''
+        Use this when you want to directly interact with the remote session.
+
+        :param string: String to send to the remote session.
+        :type string: ``str``
+        '''
+        if self.recorder!=None:
+            self.recorder.sent(string)
+        self.bytes_out += len(string)
+        self.sent_at = time.monotonic()
+        self.first_byte_at = None
+        self.send(string)
+
+    def sendline(self,send_string,newline=None):
+        '''
+        Saves and sends the send string provided to the remote session with a newline added.
+
+        :param send_string: String to send to the remote session.
+        :type send_string: ``str``
+        :param newline: Override the newline character sent to the remote session.
+        :type newline: ``str``
+        '''
+        self.current_send_string = send_string
+        if newline==None:
+            newline = self.newline
+        self.sendline_raw(send_string+newline)
+
+    def native(self,string):
+        '''
+        Convert a ``str`` into what output is matched and returned as, ``bytes`` when :var:`redexpect.RedExpect.bytes_mode` is set.
+
+        :param string: String to convert.
+        :type string: ``str``
+        :returns: ``str`` or ``bytes``
+        '''
+        return(self.engine.native(string))
+
+    def decode(self,data):
+        '''
+        Decode raw data from the remote session with the session's incremental decoder.
+        Incomplete characters at the end of ``data`` are held back until the rest of them arrive.
+        This returns ``data`` untouched when :var:`redexpect.RedExpect.bytes_mode` is set.
+
+        :param data: Raw data from the remote session.
+        :type data: ``bytes``
+        :returns: ``str`` or ``bytes``
+        '''
+        return(self.engine.decode(data))
+
+    def remote_text_clean(self,string,strip_ansi=True):
+        '''
+        Remove carriage returns and terminal escape sequences from the next piece of decoded output.
+        This goes through the session's :class:`redexpect.terminal.TerminalFilter` so it must be given output in the order it was received.
+
+        :param string: Decoded output from the remote session.
+        :type string: ``str`` or ``bytes``
+        :param strip_ansi: Set to ``False`` to only remove carriage returns.
+        :type strip_ansi: ``bool``
+        :returns: ``str`` or ``bytes``
+        '''
+        return(self.engine.clean(string,strip_ansi=strip_ansi))
+
+    def get_unique_prompt(self):
+        '''
+        Return a unique prompt from the existing SSH session. Override this function to generate the compiled regex however you'd like, eg, from a database or from a hostname.
+
+        :returns: compiled ``regex str``
+        '''
+        return(self._run(self._get_unique_prompt_steps()))
+
+    def _get_unique_prompt_steps(self):
+        # A smart-ish way to get the current prompt after a dumb prompt match
+        return(re.escape(self._unique_prompt((yield(functools.partial(self.command,'',clean_output=False))))))
+
+    def _unique_prompt(self,output):
+        # Without echo the newline sent isn't sent back before the prompt.
+        if self.remote_echo==True:
+            return(output[1:])
+        return(output)
+
+    def set_unique_prompt(self,use_basic_prompt=True,set_prompt=False):
+        '''
+        Set a unique prompt in the existing SSH session.
+
+        With a :var:`redexpect.RedExpect.prompt_cache` and :var:`redexpect.RedExpect.prompt_cache_key` set, a prompt
+        saved by an earlier session is used without a round trip if the prompt that was just matched ends with it,
+        otherwise the prompt is found with :func:`redexpect.RedExpect.get_unique_prompt` and saved.
+        The key has :var:`redexpect.RedExpect.privilege` added to it, which :func:`redexpect.RedExpect.sudo` sets to the command it ran.
+
+        :param use_basic_prompt: Use the dumb prompt from first login to the remote terminal.
+        :type use_basic_prompt: ``bool``
+        :param set_prompt: Set to ``True`` to set the prompt via :var:`redexpect.RedExpect.PROMPT_SET_SH`
+        :type set_prompt: ``bool``
+        '''
+        return(self._run(self._set_unique_prompt_steps(use_basic_prompt,set_prompt)))
+
+    def _set_unique_prompt_steps(self,use_basic_prompt,set_prompt):
+        started = time.monotonic()
+        if use_basic_prompt==True:
+            self.prompt_regex = self.basic_prompt
+        if set_prompt==True:
+            yield(functools.partial(self.command,self.prompt_regex_SET_SH))
+        if self._cached_prompt()==False:
+            self.prompt_regex = yield(self.get_unique_prompt)
+            self._cache_prompt()
+        self.metrics.timing(metrics.PROMPT_DISCOVERY,time.monotonic()-started)
+
+    def _prompt_cache_key(self):
+        if self.prompt_cache==None or self.prompt_cache_key==None:
+            return(None)
+        return(tuple(self.prompt_cache_key)+(self.privilege,))
+
+    def _cached_prompt(self):
+        # A cached prompt is only used if the prompt that was just matched ends with it.
+        key = self._prompt_cache_key()
+        if key==None:
+            return(False)
+        cached = self.prompt_cache.get(key)
+        if cached==None:
+            return(False)
+        cached_regex = '(?:^|\n)(?:'+cached+')$'
+        if self.bytes_mode==True:
+            # Prompts are cached as text decoded from latin-1, the way PatternSet encodes regexes for bytes.
+            cached_regex = cached_regex.encode('latin-1')
+        if re.search(cached_regex,self.after)==None:
+            return(False)
+        self.prompt_regex = cached
+        return(True)
+
+    def _cache_prompt(self):
+        key = self._prompt_cache_key()
+        if key!=None:
+            prompt = self.prompt_regex
+            if isinstance(prompt,bytes):
+                prompt = prompt.decode('latin-1')
+            self.prompt_cache.put(key,prompt)
+
+    def prompt(self,additional_matches=[],timeout=None):
+        '''
+        Get a command line prompt in the terminal.
+        Useful for using :func:`redexpect.RedExpect.sendline` to send commands
+        then using this for when you want to get back to a prompt to enter further commands.
+
+        :param additional_matches: Additional matches to count as a prompt.
+        :type additional_matches: ``arr``, ``regex str`` or :class:`redexpect.patterns.PatternSet`
+        :param timeout: Timeout for the prompt to be reached.
+        :type timeout: ``float`` or ``int``
+        :raises: :class:`redexpect.exceptions.ExpectTimeout` if the timeout for expect has been reached.
+        :returns: ``int`` - Match number, ``0`` is always the prompt defined for the session.
+        '''
+        return(self.expect(self._prompt_patterns(additional_matches),timeout=timeout))
+
+    def _prompt_patterns(self,additional_matches):
+        return(self.engine.compile((self.prompt_regex,)+patterns.to_expressions(additional_matches)))
+
+    def expect(self,re_strings='',default_match_prefix='',strip_ansi=True,timeout=None,full_history=False,spool=None):
+        '''
+        This function takes in a regular expression (or regular expressions)
+        that represent the last line of output from the server. The function
+        waits for one or more of the terms to be matched. The regexes are
+        matched using expression ``r'\\n<regex>$'`` so you'll need to provide an
+        easygoing regex such as ``'.*server.*'`` if you wish to have a fuzzy
+        match.
+
+        This has been originally taken from paramiko_expect and modified to work with RedExpect.
+        I've also made the style consistent with the rest of the library.
+
+        Output is matched incrementally, only new output and the last :var:`redexpect.RedExpect.expect_lookbehind`
+        characters before it are searched each time more output arrives.
+
+        Output received after the match is kept in the session's receive buffer, see :var:`redexpect.RedExpect.buffer`,
+        and is searched first by the next expect before any more is read from the remote session.
+        After a match :var:`redexpect.RedExpect.before` holds the output before the match, :var:`redexpect.RedExpect.after`
+        holds the matched text and :var:`redexpect.RedExpect.match` holds the ``re.Match`` object.
+
+        :param re_strings: Either a regex string or list of regex strings
+                           that we should expect; if this is not specified,
+                           then ``EOF`` is expected (i.e. the shell is completely
+                           closed after the exit command is issued)
+        :type re_strings: ``array``, ``regex str`` or :class:`redexpect.patterns.PatternSet`
+        :param default_match_prefix: A prefix to all match regexes, defaults to ``''``.
+                                     Useful for making sure you have a prefix to match the start of a prompt.
+                                     Ignored when ``re_strings`` is a :class:`redexpect.patterns.PatternSet`.
+        :type default_match_prefix: ``str``
+        :param strip_ansi: If ``True``, will strip ansi control chars befores regex matching.
+        :type strip_ansi: ``bool``
+        :param timeout: Set the timeout for this finish blocking within, setting to ``None`` takes the value from :var:`redexpect.RedExpect.expect_timeout` which can be set at first instance, set to ``0`` to disable.
+                        This is cut short by :var:`redexpect.RedExpect.expect_deadline` when it is set, a ``time.monotonic()`` value that all expects on the session must finish by.
+        :type timeout: ``float``
+        :param full_history: Set to ``True`` to search all output received so far each time more arrives, for regexes that can match more than :var:`redexpect.RedExpect.expect_lookbehind` characters.
+        :type full_history: ``bool``
+        :param spool: Write the output before the match to a :class:`redexpect.spool.SpooledOutput` as it arrives
+                      instead of holding it in memory, it is kept in :var:`redexpect.RedExpect.spooled` and
+                      :var:`redexpect.RedExpect.before` only holds the last line of it. Either ``True``, the size in
+                      bytes to keep in memory before moving to a temporary file or a binary file to write to.
+                      ``False`` is the same as ``None``. Matches must not span a newline when this is used, see :func:`redexpect.engine.ExpectEngine.drain`.
+        :type spool: ``bool``, ``int`` or ``file``
+        :return: ``int`` - An ``EOF`` returns ``-1``, a regex metch returns ``0`` and a match in a
+                 list of regexes returns the index of the matched string in
+                 the list.
+        :raises: :class:`redexpect.exceptions.ExpectTimeout` if the timeout for expect has been reached.
+        :raises: :class:`redexpect.exceptions.BufferOverflow` if more output arrives than :var:`redexpect.RedExpect.expect_max_buffer` allows.
+        '''
+        if spool!=None and spool is not False:
+            stream = _OutputStream(None,False,self.native(''),self.native('\n'))
+            return(self._run(self._spool_steps(spool,re_strings,stream,False,default_match_prefix,strip_ansi,timeout)))
+        return(self._run(self._expect_steps(re_strings,default_match_prefix,strip_ansi,timeout,full_history)))
+
+    def _expect_steps(self,re_strings,default_match_prefix='',strip_ansi=True,timeout=None,full_history=False,stream=None,output=None):
+        # With a ``stream`` output is passed through it to ``output`` as it arrives instead of being held until the match.
+        (pattern_set,found) = self._expect_begin(re_strings,default_match_prefix,full_history)
+        deadline = self._expect_deadline(timeout)
+
+        while found==None:
+            received = False
+            for current_buffer in self._read():
+                received = True
+                if current_buffer==None:
+                    if stream!=None:
+                        self._stream_output(stream.feed(self.engine.drain())+stream.finish(),output)
+                    return(-1)
+                found = self._expect_feed(current_buffer,strip_ansi)
+                if found!=None:
+                    break
+                if stream!=None:
+                    self._stream_output(stream.feed(self.engine.drain()),output)
+                    # Lets command_stream() hand the output on before reading more.
+                    yield(None)
+            if found==None:
+                wait = self._expect_wait_time(pattern_set,deadline)
+                if received==False and wait>0:
+                    yield(functools.partial(self._wait,wait))
+
+        if stream!=None:
+            # The echo has already been taken out of the stream.
+            self.current_send_string = ''
+        index = self._expect_finish(pattern_set,found)
+        if stream!=None:
+            self._stream_output(stream.feed(found.before)+stream.finish(),output)
+        return(index)
+        # If someone manages to get a ``None`` instead of a -1 please open an issue.
+        # I want to know how you did that so I can write a test for it :)
+
+    def _stream_output(self,pieces,output):
+        for piece in pieces:
+            output(piece)
+
+    # The _expect_* functions hold all of expect() that doesn't touch the transport,
+    # so that other ways of waiting on data can share them.
+    def _expect_begin(self,re_strings,default_match_prefix,full_history):
+        pattern_set = self.engine.compile(re_strings,prefix=default_match_prefix)
+        self.expect_started = time.monotonic()
+        return((pattern_set,self.engine.begin(pattern_set,full_history=full_history)))
+
+    def _expect_deadline(self,timeout):
+        if timeout==None:
+            timeout = self.expect_timeout
+        deadline = None
+        if timeout!=0:
+            deadline = time.monotonic()+timeout
+        if self.expect_deadline!=None and (deadline==None or self.expect_deadline<deadline):
+            deadline = self.expect_deadline
+        return(deadline)
+
+    def _expect_feed(self,data,strip_ansi):
+        if self.recorder!=None:
+            self.recorder.received(data)
+        self.bytes_in += len(data)
+        self.chunks_read += 1
+        if self.first_byte_at==None:
+            self.first_byte_at = time.monotonic()
+        if self.profile!=None:
+            return(self._profiled_feed(data,strip_ansi))
+        return(self.engine.feed_text(self.remote_text_clean(self.decode(data),strip_ansi=strip_ansi)))
+
+    # With profiling on, each phase of expect goes through one of these instead so the time spent in it can be added up.
+    def _read(self):
+        if self.profile==None:
+            return(self._reader())
+        return(self._profiled_read())
+
+    def _reader(self):
+        return(self.read())
+
+    def _profiled_read(self):
+        reader = iter(self._reader())
+        while True:
+            started = time.perf_counter()
+            try:
+                data = next(reader)
+            except StopIteration:
+                self.profile.add(('expect',profiler.READ),time.perf_counter()-started)
+                return
+            self.profile.add(('expect',profiler.READ),time.perf_counter()-started)
+            yield(data)
+
+    def _wait(self,wait):
+        if self.profile==None:
+            return(self.wait_for_data(wait))
+        started = time.perf_counter()
+        self.wait_for_data(wait)
+        self.profile.add(('expect',profiler.WAIT),time.perf_counter()-started)
+
+    def _profiled_feed(self,data,strip_ansi):
+        started = time.perf_counter()
+        text = self.decode(data)
+        decoded = time.perf_counter()
+        text = self.remote_text_clean(text,strip_ansi=strip_ansi)
+        cleaned = time.perf_counter()
+        found = self.engine.feed_text(text)
+        searched = time.perf_counter()
+        self.profile.add(('expect',profiler.DECODE),decoded-started)
+        self.profile.add(('expect',profiler.REMOTE_TEXT_CLEAN),cleaned-decoded)
+        self.profile.add(('expect',profiler.SEARCH),searched-cleaned)
+        return(found)
+
+    def _profiled_clean(self,clean,*args):
+        if self.profile==None:
+            return(clean(*args))
+        started = time.perf_counter()
+        out = clean(*args)
+        self.profile.add((profiler.CLEAN,),time.perf_counter()-started)
+        return(out)
+
+    def _expect_wait_time(self,pattern_set,deadline):
+        wait = self.expect_wait_interval
+        if deadline!=None:
+            remaining = deadline-time.monotonic()
+            if remaining<0:
+                raise(exceptions.ExpectTimeout(list(pattern_set.re_strings)))
+            wait = min(wait,remaining)
+        return(wait)
+
+    def _expect_finish(self,pattern_set,found):
+        # Cleaning is left to the result, so output that is never looked at is never cleaned.
+        self.last_result = result.CommandResult(found.output,found.match_start,found.match,found.index,found.re_string,
+            echoes=self._echoes([self.current_send_string]),cleaner=pattern_set.cleaner(found.index),
+            started=self.expect_started,finished=time.monotonic())
+        self.current_send_string = ''
+        self.metrics.timing(metrics.EXPECT,self.last_result.duration)
+        self._report_counts()
+        self.last_match = found.re_string
+        return(found.index)
+
+    def _report_counts(self):
+        # Counts are kept as running totals and only the change since the last report is passed on.
+        if self.metrics==NULL_METRICS:
+            return
+        totals = ((metrics.BYTES_IN,self.bytes_in),(metrics.BYTES_OUT,self.bytes_out),(metrics.CHUNKS_READ,self.chunks_read),
+            (metrics.REGEX_SEARCHES,self.engine.searches))
+        for (name,total) in totals:
+            change = total-self.reported_counts.get(name,0)
+            if change!=0:
+                self.metrics.count(name,change)
+                self.reported_counts[name] = total
+
+    def _report_first_byte(self):
+        if self.first_byte_at!=None and self.sent_at!=None:
+            self.metrics.timing(metrics.FIRST_BYTE,self.first_byte_at-self.sent_at)
+
+    def clean_output(self,output,send_strings,cleaner):
+        '''
+        Remove the echoed send strings and the text matched by ``cleaner`` from output.
+
+        :param output: Output from the remote session.
+        :type output: ``str`` or ``bytes``
+        :param send_strings: Strings that were sent to the remote session and might be echoed back.
+        :type send_strings: ``array``
+        :param cleaner: Compiled regex of what to remove, usually the prompt.
+        :type cleaner: ``re.Pattern``
+        :returns: ``str`` or ``bytes``
+        '''
+        return(result.clean(output,self._echoes(send_strings),cleaner))
+
+    def _echoes(self,send_strings):
+        if self.remote_echo==False:
+            return([])
+        return([self.native(send_string+'\n') for send_string in send_strings if len(send_string)!=0])
+
+    def _last_result(self,name,default):
+        if self.last_result==None:
+            return(default)
+        return(getattr(self.last_result,name))
+
+    @property
+    def current_output(self):
+        '''
+        All output up to and including the last match, assigning it replaces :var:`redexpect.RedExpect.last_result`.
+
+        :returns: ``str`` or ``bytes``
+        '''
+        return(self._last_result('output',self.native('')))
+
+    @property
+    def current_output_clean(self):
+        '''
+        :var:`redexpect.RedExpect.current_output` without the echoed command and the matched prompt, cleaned the first time it is used.
+        Assigning it overrides the cleaned output of :var:`redexpect.RedExpect.last_result`.
+
+        :returns: ``str`` or ``bytes``
+        '''
+        return(self._profiled_clean(self._last_result,'clean',self.native('')))
+
+    @current_output.setter
+    def current_output(self,output):
+        # Assigning output replaces the last result with one where nothing matched, so before is all of it.
+        self.last_result = result.CommandResult(output,len(output),None,None,None)
+
+    @current_output_clean.setter
+    def current_output_clean(self,output):
+        # The last result may have been handed out by command(result=True), so a copy gets the new cleaned output.
+        last = self.last_result
+        if last==None:
+            last = result.CommandResult(self.native(''),0,None,None,None)
+        self.last_result = result.CommandResult(last.output,last.match_start,last.match,last.index,last.re_string,
+            last.echoes,last.cleaner,last.started,last.finished,last.exit_status)
+        self.last_result._clean = output
+
+    @property
+    def before(self):
+        '''
+        :returns: ``str`` or ``bytes`` - Output before the last match.
+        '''
+        return(self._last_result('before',self.native('')))
+
+    @property
+    def after(self):
+        '''
+        :returns: ``str`` or ``bytes`` - The text of the last match.
+        '''
+        return(self._last_result('after',self.native('')))
+
+    @property
+    def match(self):
+        '''
+        :returns: ``re.Match`` of the last match, or ``None``.
+        '''
+        return(self._last_result('match',None))
+
+    @property
+    def buffer(self):
+        '''
+        Output that has been received but not yet consumed by a match in :func:`redexpect.RedExpect.expect`.
+
+        :returns: ``str``, or ``bytes`` when :var:`redexpect.RedExpect.bytes_mode` is set.
+        '''
+        return(self.engine.buffer)
+
+    def out_feed(self,raw_data):
+        '''
+        Override to get the raw data from the remote machine into a function.
+
+        Useful as a way to get data from the ``expect()`` to another library without impacting the expect side.
+        This is called for every chunk read, inside expect, so anything slow in here delays matching.
+        By default data is passed to :var:`redexpect.RedExpect.out_sink`, see :class:`redexpect.sinks.BatchedSink` for one
+        that writes it out from a background thread.
+        '''
+        if self.out_sink!=None:
+            self.out_sink(raw_data)
+
+    def command(self,cmd,clean_output=True,remove_newline=False,timeout=None,spool=None,result=False,pager=False,capture_status=False):
+        '''
+        Run a command in the remote terminal.
+
+        :param cmd: Command to execute, this will send characters exactly as if they were typed. (crtl+c could be sent via this).
+        :type cmd: ``str``
+        :param clean_output: Set to ``False`` to remove the "smart" cleaning, useful for debugging or for when you want the prompt as well.
+        :type clean_output: ``bool``
+        :param remove_newline: Set to ``True`` to remove the last newline on a return, useful when a command adds a newline to its output.
+        :type remove_newline: ``bool``
+        :param timeout: Set the timeout for this command to complete within, if set to ``None`` this will use the value of :var:`redexpect.RedExpect.expect_timeout` which can be set at first instance.
+        :type timeout: ``float``
+        :param spool: Write the cleaned output to a :class:`redexpect.spool.SpooledOutput` as it arrives and return that
+                      instead of a string, for output too large to hold in memory. Either ``True``, the size in bytes to
+                      keep in memory before moving to a temporary file or a binary file to write to.
+                      ``False`` is the same as ``None``. ``clean_output`` and ``remove_newline`` are ignored, see :func:`redexpect.RedExpect.command_stream`
+                      for how the output is cleaned.
+        :type spool: ``bool``, ``int`` or ``file``
+        :param result: Set to ``True`` to return a :class:`redexpect.result.CommandResult` instead of a string, which only
+                       cleans the output if it is used, along with how long the command took. ``clean_output`` and
+                       ``remove_newline`` are ignored.
+        :type result: ``bool``
+        :param pager: Set to ``True`` to answer pager prompts such as ``--More--`` with :var:`redexpect.RedExpect.pager_response`
+                      as soon as they arrive, until the prompt is reached. The pager prompts, see :var:`redexpect.RedExpect.pager_prompts`,
+                      and any backspaces the pager erases them with are left out of the output.
+                      ``timeout`` applies to each page. Ignored when ``spool`` is set.
+        :type pager: ``bool``
+        :param capture_status: Set to ``True`` to get the exit status of the command in the same round trip, by sending
+                               :var:`redexpect.RedExpect.status_echo` straight after it like :func:`redexpect.RedExpect.command_batch` does.
+                               :class:`redexpect.exceptions.CommandFailed` is raised if it isn't ``0``, unless ``result`` is set in
+                               which case it is left to the caller to check :var:`redexpect.result.CommandResult.exit_status`.
+                               Set :var:`redexpect.RedExpect.status_echo` to :var:`redexpect.RedExpect.status_echo_CSH` on csh.
+                               ``pager`` is ignored when this is set.
+        :type capture_status: ``bool``
+
+        :returns: ``str``, or ``bytes`` when :var:`redexpect.RedExpect.bytes_mode` is set, :class:`redexpect.spool.SpooledOutput` when ``spool`` is set or :class:`redexpect.result.CommandResult` when ``result`` is set.
+        :raises: :class:`redexpect.exceptions.ExpectTimeout` if the timeout for expect has been reached.
+        :raises: :class:`redexpect.exceptions.CommandFailed` if ``capture_status`` is set and the command failed.
+        '''
+        if spool!=None and spool is not False:
+            stream = self._command_stream_send(cmd,False)
+            return(self._run(self._spool_steps(spool,self._prompt_patterns([]),stream,True,timeout=timeout)))
+        return(self._run(self._command_steps(cmd,clean_output,remove_newline,timeout,result,pager,capture_status)))
+
+    def _command_steps(self,cmd,clean_output,remove_newline,timeout,result,pager,capture_status):
+        started = time.monotonic()
+        if capture_status==True:
+            (lines,sentinels) = self._batch_send([cmd])
+            if (yield(functools.partial(self.expect,sentinels[0],timeout=timeout)))!=-1:
+                self._report_first_byte()
+                status = self.last_result
+                yield(functools.partial(self.prompt,timeout=timeout))
+                self._status_finish(cmd,lines,status,result)
+            return(self._command_output(clean_output,remove_newline,result,started))
+        self.sendline(cmd)
+        if pager==True:
+            pages = []
+            pattern_set = self._pager_patterns()
+            matched = yield(functools.partial(self.expect,pattern_set,timeout=timeout))
+            self._report_first_byte()
+            while matched>0:
+                self._pager_page(pages)
+                matched = yield(functools.partial(self.expect,pattern_set,timeout=timeout))
+            self._pager_finish(cmd,pages,started)
+        else:
+            yield(functools.partial(self.prompt,timeout=timeout))
+            self._report_first_byte()
+        return(self._command_output(clean_output,remove_newline,result,started))
+
+    def _status_finish(self,cmd,lines,status,result_wanted):
+        # The output up to the status sentinel is the command's, the sentinel line itself is removed like an echo.
+        status.exit_status = int(status.match.group(1))
+        status.echoes = self._echoes(lines)+[status.after]
+        status.cleaner = self.engine.compile(self.prompt_regex).cleaner(0)
+        self.last_result = status
+        if status.exit_status!=0 and result_wanted==False:
+            raise(exceptions.CommandFailed(cmd,status))
+
+    def _pager_patterns(self):
+        return(self.engine.compile((self.prompt_regex,)+patterns.to_expressions(self.pager_prompts)))
+
+    def _pager_erased(self,text,first):
+        # Pagers erase their prompt with backspaces once answered, which turn up at the start of the next page.
+        if first==True:
+            return(0)
+        erased = re.match(self.native(self.pager_erase),text)
+        if erased==None:
+            return(0)
+        return(erased.end())
+
+    def _pager_page(self,pages):
+        before = self.before
+        pages.append(before[self._pager_erased(before,len(pages)==0):])
+        self.sendline_raw(self.pager_response)
+
+    def _pager_finish(self,cmd,pages,started):
+        # Put the pages back together into one result, as if the output had arrived without a pager.
+        last = self.last_result
+        if len(pages)==0 or last==None:
+            return
+        head = self.native('').join(pages)
+        erased = self._pager_erased(last.output,False)
+        self.last_result = result.CommandResult(head+last.output[erased:],len(head)+last.match_start-erased,last.match,last.index,
+            last.re_string,echoes=self._echoes([cmd]),cleaner=last.cleaner,started=started,finished=last.finished)
+
+    def command_stream(self,cmd,lines=False,timeout=None):
+        '''
+        Run a command in the remote terminal and yield its cleaned output as it arrives, stopping at the prompt.
+        Only a chunk of output at a time is held, so this suits commands with more output than should be kept in memory.
+
+        The echo of ``cmd`` is removed from the start of the output and the prompt is not yielded. Output is only passed on
+        once a prompt can no longer start in it, see :func:`redexpect.engine.ExpectEngine.drain`, which means the
+        prompt must not span a newline. Afterwards :var:`redexpect.RedExpect.current_output` only holds the last
+        piece of output along with the prompt. Iterate the whole generator before using the session again.
+
+        :param cmd: Command to execute.
+        :type cmd: ``str``
+        :param lines: Set to ``True`` to yield whole lines, each ending in a newline apart from maybe the last one.
+        :type lines: ``bool``
+        :param timeout: Set the timeout for the prompt to be reached, if set to ``None`` this will use the value of :var:`redexpect.RedExpect.expect_timeout`.
+        :type timeout: ``float``
+
+        :returns: ``generator`` of ``str``, or ``bytes`` when :var:`redexpect.RedExpect.bytes_mode` is set.
+        :raises: :class:`redexpect.exceptions.ExpectTimeout` if the timeout for expect has been reached.
+        '''
+        stream = self._command_stream_send(cmd,lines)
+        pieces = []
+        steps = self._expect_steps(self._prompt_patterns([]),timeout=timeout,stream=stream,output=pieces.append)
+        # Runs the steps like _run() does, handing on the output gathered after each one.
+        while True:
+            try:
+                step = next(steps)
+            except StopIteration:
+                break
+            for piece in pieces:
+                yield(piece)
+            del pieces[:]
+            if step!=None:
+                step()
+        for piece in pieces:
+            yield(piece)
+
+    def _command_stream_send(self,cmd,lines):
+        self.sendline(cmd)
+        echo = None
+        if self.remote_echo==True:
+            echo = self.native(cmd+'\n')
+        return(_OutputStream(echo,lines,self.native(''),self.native('\n')))
+
+    def _spool_steps(self,spool,re_strings,stream,command,default_match_prefix='',strip_ansi=True,timeout=None):
+        # Returns the SpooledOutput for a command, or what expect() would have returned.
+        if isinstance(spool,bool):
+            spooled = SpooledOutput(encoding=self.encoding)
+        elif isinstance(spool,int):
+            spooled = SpooledOutput(threshold=spool,encoding=self.encoding)
+        else:
+            spooled = SpooledOutput(fileobj=spool,encoding=self.encoding)
+        index = yield from self._expect_steps(re_strings,default_match_prefix,strip_ansi,timeout,stream=stream,output=spooled.write)
+        self.spooled = spooled
+        if command==True:
+            return(spooled)
+        return(index)
+
+    def _command_output(self,clean_output,remove_newline,result=False,started=None):
+        if result==True:
+            self.last_result.started = started
+            return(self.last_result)
+        if clean_output==True:
+            out = self.current_output_clean
+        else:
+            out = self.current_output
+        if remove_newline==True:
+            out = out.rstrip(self.native('\r\n'))
+        return(out)
+
+    def command_batch(self,cmds,remove_newline=False,timeout=None):
+        '''
+        Run several commands in the remote terminal while only waiting on the remote server once.
+
+        All of the commands are sent in a single write, each one followed by a command from
+        :var:`redexpect.RedExpect.status_echo` that prints a unique sentinel with the exit status of the command before it.
+        The output is then split up on these sentinels, so the whole batch takes about one round trip plus the time the
+        commands take to run instead of one round trip per command.
+        Commands in a batch must not read from stdin, otherwise they will read the commands sent after them.
+
+        :param cmds: Commands to execute.
+        :type cmds: ``array`` of ``str``
+        :param remove_newline: Set to ``True`` to remove the last newline from the output of each command.
+        :type remove_newline: ``bool``
+        :param timeout: Set the timeout for each command to complete within, if set to ``None`` this will use the value of :var:`redexpect.RedExpect.expect_timeout`.
+        :type timeout: ``float``
+
+        :returns: ``array`` of ``tuple (int, str)`` - of ``(exit_status, command_output)`` for each command,
+                  only for the commands that finished if the remote end closes partway through.
+        :raises: :class:`redexpect.exceptions.ExpectTimeout` if the timeout for expect has been reached.
+        '''
+        return(self._run(self._command_batch_steps(cmds,remove_newline,timeout)))
+
+    def _command_batch_steps(self,cmds,remove_newline,timeout):
+        (lines,sentinels) = self._batch_send(cmds)
+        results = []
+        for sentinel_regex in sentinels:
+            if (yield(functools.partial(self.expect,sentinel_regex,timeout=timeout)))==-1:
+                return(results)
+            results.append(self._batch_result(lines,remove_newline))
+        yield(functools.partial(self.prompt,timeout=timeout))
+        return(results)
+
+    def _batch_send(self,cmds):
+        sentinel = 'REDEXPECT'+uuid.uuid4().hex[:16]
+        sentinels = []
+        lines = []
+        for (index,cmd) in enumerate(cmds):
+            sentinels.append(re.escape(sentinel+'_'+str(index)+'_')+r'(\d+)\n')
+            lines += [cmd,self.status_echo.format(sentinel+'_'+str(index))]
+        self.current_send_string = ''
+        self.sendline_raw(self.newline.join(lines)+self.newline)
+        return((lines,sentinels))
+
+    def _batch_result(self,lines,remove_newline):
+        # A terminal that echoes input echoes the whole batch as soon as it arrives,
+        # so any of the lines sent can turn up in the output of any command.
+        prompt_cleaner = self.engine.compile(self.prompt_regex).cleaner(0)
+        out = self._profiled_clean(self.clean_output,self.before,lines,prompt_cleaner)
+        if remove_newline==True:
+            out = out.rstrip(self.native('\r\n'))
+        return((int(self.match.group(1)),out))
+
+    def sudo(self,password,sudo=True,su_cmd='su -',password_prompt=r'.+?asswor.+?\:\s+',failure_matches=[r'Sorry.+?\.',r'.+?Authentication failure']):
+        '''
+        Sudo up or SU up or whatever up, into higher privileges.
+
+        :param password: Password for gaining privileges
+        :type password: ``str``
+        :param sudo: Set to ``False`` to allow ``su_cmd`` to be executed instead.
+        :type sudo: ``bool``
+        :param su_cmd: Command to be executed when ``sudo`` is ``False``, allows overriding of the ``'sudo'`` default.
+        :type su_cmd: ``str``
+        :param password_prompt: Regex to match the password prompt with.
+        :type password_prompt: ``regex str`` or :class:`redexpect.patterns.PatternSet`
+        :param failure_matches: Regexes that mean the password was not accepted, useful for platforms with different failure messages.
+        :type failure_matches: ``array``, ``regex str`` or :class:`redexpect.patterns.PatternSet`
+        :return: ``None``
+        :raises: :class:`redexpect.exceptions.BadSudoPassword` if the password provided does not allow for privilege escalation.
+        '''
+        return(self._run(self._sudo_steps(password,sudo,su_cmd,password_prompt,failure_matches)))
+
+    def _sudo_steps(self,password,sudo,su_cmd,password_prompt,failure_matches):
+        started = time.monotonic()
+        cmd = su_cmd
+        if sudo==True:
+            cmd = 'sudo '+su_cmd
+        self.sendline(cmd)
+        password_prompts = self.engine.compile(password_prompt)
+        bad_response = password_prompts.expressions+patterns.to_expressions(failure_matches)
+        response = self.engine.compile(bad_response+(self.basic_prompt,))
+        yield(functools.partial(self.expect,password_prompts))
+        self.sendline_raw(password+self.newline)
+        result = yield(functools.partial(self.expect,response))
+        if result>=len(bad_response):
+            self.privilege = cmd
+            yield(self.set_unique_prompt)
+            self.metrics.timing(metrics.SUDO,time.monotonic()-started)
+        else:
+            # Output after the failure is no longer thrown away, so get back to the shell prompt before raising.
+            # sudo asks for the password again after a failure and su drops straight back to the prompt.
+            if result<len(password_prompts) or (yield(functools.partial(self.prompt,additional_matches=password_prompts)))!=0:
+                self.sendline_raw('\x03')
+                yield(self.prompt)
+            raise(exceptions.BadSudoPassword())
+
+
+class _OutputStream(object):
+    # Removes the echo of a command from the start of streamed output and splits the output into lines when asked to.
+    def __init__(self,echo,lines,empty,newline):
+        self.echo = echo
+        self.lines = lines
+        self.empty = empty
+        self.newline = newline
+        self.pending = empty
+
+    def feed(self,text):
+        self.pending += text
+        if self.echo!=None:
+            if self.echo.startswith(self.pending):
+                return([])
+            if self.pending.startswith(self.echo):
+                self.pending = self.pending[len(self.echo):]
+            self.echo = None
+        end = len(self.pending)
+        if self.lines==True:
+            end = self.pending.rfind(self.newline)+1
+        if end==0:
+            return([])
+        output = self.pending[:end]
+        self.pending = self.pending[end:]
+        if self.lines==True:
+            return(output.splitlines(True))
+        return([output])
+
+    def finish(self):
+        (output,self.pending) = (self.pending,self.empty)
+        if len(output)==0 or (self.echo!=None and self.echo.startswith(output)):
+            return([])
+        return([output])
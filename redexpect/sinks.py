@@ -0,0 +1,199 @@
+# RedExpect
+# Copyright (C) 2018 - 2020  Red_M ( http://bitbucket.com/Red_M )
+
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+
+import threading
+
+
+class SinkWriter(object):
+    '''
+    A background thread that writes out the data batched up by :class:`redexpect.sinks.BatchedSink` objects.
+    Share one between many sinks, eg one per session of a :class:`redexpect.fleet.Fleet` run, so they all use a single thread.
+
+    Each sink is written out every ``flush_interval`` seconds, or sooner once it has ``batch_size`` bytes waiting.
+
+    :param flush_interval: Longest time in seconds data waits before it is written.
+    :type flush_interval: ``float``
+    '''
+    def __init__(self,flush_interval=0.5):
+        self.flush_interval = flush_interval
+        self.sinks = []
+        self.cond = threading.Condition()
+        self.woken = False
+        self.stopping = False
+        self.thread = None
+
+    def add(self,sink):
+        '''
+        Start writing out a sink, the thread is started when the first sink is added.
+
+        :param sink: Sink to write out.
+        :type sink: :class:`redexpect.sinks.BatchedSink`
+        '''
+        with self.cond:
+            self.sinks.append(sink)
+            if self.thread==None:
+                self.stopping = False
+                self.thread = threading.Thread(target=self._run,name='redexpect-sink-writer',daemon=True)
+                self.thread.start()
+
+    def remove(self,sink):
+        '''
+        Stop writing out a sink.
+
+        :param sink: Sink to stop writing out.
+        :type sink: :class:`redexpect.sinks.BatchedSink`
+        '''
+        with self.cond:
+            if sink in self.sinks:
+                self.sinks.remove(sink)
+
+    def wake(self):
+        '''
+        Write out the sinks now instead of at the next ``flush_interval``.
+        '''
+        with self.cond:
+            self.woken = True
+            self.cond.notify()
+
+    def _run(self):
+        while True:
+            with self.cond:
+                if self.woken==False and self.stopping==False:
+                    self.cond.wait(self.flush_interval)
+                self.woken = False
+                sinks = list(self.sinks)
+                stopping = self.stopping
+            for sink in sinks:
+                sink.flush()
+            if stopping==True:
+                return
+
+    def stop(self):
+        '''
+        Write out every sink one last time and stop the thread.
+        '''
+        with self.cond:
+            thread = self.thread
+            self.thread = None
+            self.stopping = True
+            self.cond.notify()
+        if thread!=None and thread!=threading.current_thread():
+            thread.join()
+
+
+class BatchedSink(object):
+    '''
+    Takes the raw data passed to :func:`redexpect.RedExpect.out_feed` and writes it out in batches from a background
+    thread, so a slow destination such as a transcript file or a log shipper doesn't hold up expecting.
+    See the ``out_sink`` argument of :class:`redexpect.RedExpect`.
+
+    At most ``max_pending`` bytes are held waiting to be written. When more arrives than that, ``block`` decides
+    what happens: by default the new data is dropped and counted in :var:`redexpect.sinks.BatchedSink.dropped`, so a
+    stalled destination never stalls the session, set it to ``True`` to instead wait for the writer to catch up so
+    nothing is lost. A single chunk bigger than ``max_pending`` is still taken when nothing else is waiting.
+
+    Errors raised by ``write`` are not raised in the session, the last one is kept in :var:`redexpect.sinks.BatchedSink.error`.
+
+    :param write: Function called with each batch, eg the ``write`` of a binary file.
+    :type write: ``function``
+    :param writer: Background writer to use, ``None`` to start one just for this sink.
+    :type writer: :class:`redexpect.sinks.SinkWriter`
+    :param batch_size: Amount of bytes waiting that makes the writer write them out before the next ``flush_interval``.
+    :type batch_size: ``int``
+    :param max_pending: Most amount of bytes to hold waiting to be written.
+    :type max_pending: ``int``
+    :param block: Set to ``True`` to wait for room instead of dropping data once ``max_pending`` bytes are waiting.
+    :type block: ``bool``
+    '''
+    def __init__(self,write,writer=None,batch_size=65536,max_pending=4194304,block=False):
+        self.write = write
+        self.own_writer = writer==None
+        if writer==None:
+            writer = SinkWriter()
+        self.writer = writer
+        self.batch_size = batch_size
+        self.max_pending = max_pending
+        self.block = block
+        self.chunks = []
+        self.pending = 0
+        self.dropped = 0
+        self.written = 0
+        self.error = None
+        self.closed = False
+        self.cond = threading.Condition()
+        self.write_lock = threading.Lock()
+        self.writer.add(self)
+
+    def __call__(self,data):
+        self.feed(data)
+
+    def feed(self,data):
+        '''
+        Queue data to be written, this only waits when ``block`` is set and ``max_pending`` bytes are already waiting.
+
+        :param data: Raw data from the remote session.
+        :type data: ``bytes``
+        '''
+        size = len(data)
+        with self.cond:
+            if self.closed==True:
+                self.dropped += size
+                return
+            if self.pending>0 and self.pending+size>self.max_pending:
+                if self.block==False:
+                    self.dropped += size
+                    return
+                self.writer.wake()
+                while self.pending>0 and self.pending+size>self.max_pending and self.closed==False:
+                    self.cond.wait()
+            self.chunks.append(data)
+            self.pending += size
+            full = self.pending>=self.batch_size
+        if full==True:
+            self.writer.wake()
+
+    def flush(self):
+        '''
+        Write out everything waiting now, in the calling thread.
+        '''
+        with self.write_lock:
+            with self.cond:
+                chunks = self.chunks
+                self.chunks = []
+                self.pending = 0
+                self.cond.notify_all()
+            if len(chunks)==0:
+                return
+            data = chunks[0][:0].join(chunks)
+            try:
+                self.write(data)
+                self.written += len(data)
+            except Exception as e:
+                self.error = e
+
+    def close(self):
+        '''
+        Write out everything waiting and stop taking more data, data fed after this is counted as dropped.
+        '''
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+        self.writer.remove(self)
+        self.flush()
+        if self.own_writer==True:
+            self.writer.stop()
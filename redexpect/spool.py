@@ -0,0 +1,120 @@
+# RedExpect
+# Copyright (C) 2018 - 2020  Red_M ( http://bitbucket.com/Red_M )
+
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+
+import codecs
+import mmap
+import tempfile
+
+SPOOL_THRESHOLD = 1024*1024
+
+
+class SpooledOutput(object):
+    '''
+    Output written to memory until it passes a threshold and to a temporary file after that, for command output that
+    is needed whole but is too large to keep as a ``str``. See the ``spool`` argument of :func:`redexpect.RedExpect.command`.
+
+    :func:`redexpect.spool.SpooledOutput.view` gives the output as ``bytes`` while it is small and as a read only
+    ``mmap.mmap`` of the file once it isn't, both of which can be sliced and searched with ``bytes`` regexes without
+    reading the file into memory.
+
+    :param threshold: Size in bytes past which output is moved to a temporary file, ``0`` to write straight to one.
+    :type threshold: ``int``
+    :param fileobj: Binary file opened for reading and writing to write output straight to instead, eg to keep it after the session.
+    :type fileobj: ``file``
+    :param encoding: Encoding to write ``str`` output with.
+    :type encoding: ``str``
+    '''
+    def __init__(self,threshold=SPOOL_THRESHOLD,fileobj=None,encoding='utf8'):
+        self.threshold = threshold
+        self.encoding = encoding
+        self.size = 0
+        self.fileobj = fileobj
+        self.on_disk = True
+        if self.fileobj==None and threshold<=0:
+            # SpooledTemporaryFile takes a max_size of 0 as no limit.
+            self.fileobj = tempfile.TemporaryFile()
+        elif self.fileobj==None:
+            self.fileobj = tempfile.SpooledTemporaryFile(max_size=threshold)
+            self.on_disk = False
+        self._mmap = None
+        self._encoder = None
+
+    def __len__(self):
+        return(self.size)
+
+    def __repr__(self):
+        return('SpooledOutput('+str(self.size)+' bytes, spilled='+str(self.spilled)+')')
+
+    @property
+    def spilled(self):
+        '''
+        :returns: ``bool`` - ``True`` if the output is in a file rather than memory.
+        '''
+        return(self.on_disk)
+
+    def write(self,data):
+        '''
+        Add output to the end.
+
+        :param data: Output to add.
+        :type data: ``str`` or ``bytes``
+        '''
+        if isinstance(data,str):
+            # Output arrives in pieces, one encoder keeps eg a UTF-16 BOM to the start instead of before every piece.
+            if self._encoder==None:
+                self._encoder = codecs.getincrementalencoder(self.encoding)()
+            data = self._encoder.encode(data)
+        self.fileobj.seek(0,2)
+        self.fileobj.write(data)
+        self.size += len(data)
+        if self.on_disk==False and self.size>self.threshold:
+            self.fileobj.rollover()
+            self.on_disk = True
+        self._close_mmap()
+
+    def view(self):
+        '''
+        :returns: ``bytes`` or ``mmap.mmap`` - All of the output, the mmap stays valid until more output is written or this is closed.
+        '''
+        if self.spilled==False or self.size==0:
+            self.fileobj.seek(0)
+            return(self.fileobj.read())
+        if self._mmap==None:
+            self.fileobj.flush()
+            self._mmap = mmap.mmap(self.fileobj.fileno(),0,access=mmap.ACCESS_READ)
+        return(self._mmap)
+
+    def text(self,errors='strict'):
+        '''
+        Read all of the output into memory.
+
+        :returns: ``str``
+        '''
+        return(bytes(self.view()[:self.size]).decode(self.encoding,errors))
+
+    def _close_mmap(self):
+        if self._mmap!=None:
+            self._mmap.close()
+            self._mmap = None
+
+    def close(self):
+        '''
+        Close the mmap and the file, a temporary file is deleted.
+        '''
+        self._close_mmap()
+        self.fileobj.close()
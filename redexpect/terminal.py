@@ -0,0 +1,158 @@
+# RedExpect
+# Copyright (C) 2018 - 2020  Red_M ( http://bitbucket.com/Red_M )
+
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+
+import re
+
+STATE_TEXT = 0
+STATE_ESCAPE = 1
+STATE_ESCAPE_INTERMEDIATE = 2
+STATE_CSI = 3
+STATE_STRING = 4
+STATE_STRING_ESCAPE = 5
+
+
+# A complete escape sequence, anything that fails to match this starting at an
+# ESC runs to the end of the output received so far.
+ESCAPE_SEQUENCE = r'''\x1b(?:
+    \[[\x20-\x3f]*(?:[\x40-\x7e]|(?=[^\x20-\x3f]))
+    |[\]PX^_][^\x07\x1b]*(?:\x07|\x1b\\|(?=\x1b[^\\]))
+    |[\x20-\x2f]+[^\x20-\x2f]
+    |[^\x20-\x2f\[\]PX^_]
+)'''
+
+def native_ord(char):
+    if isinstance(char,bytes):
+        return(char[0])
+    return(ord(char))
+
+class _Syntax(object):
+    def __init__(self,native):
+        self.empty = native('')
+        self.escape = native('\x1b')
+        self.escape_sequence = re.compile(native(ESCAPE_SEQUENCE),re.DOTALL|re.VERBOSE)
+        self.csi_body = re.compile(native(r'[\x20-\x3f]*'))
+        self.string_end = re.compile(native(r'[\x07\x1b]'))
+        self.cr = native('\r')
+        self.bel = native('\x07')
+        self.csi = native('[')
+        self.string_start = native(']PX^_')
+        self.string_terminator = native('\\')
+
+    def between(self,char,low,high):
+        return(native_ord(char)>=low and native_ord(char)<=high)
+
+SYNTAX = _Syntax(lambda string:string)
+SYNTAX_BYTES = _Syntax(lambda string:string.encode('latin-1'))
+
+
+class TerminalFilter(object):
+    '''
+    Removes carriage returns and terminal escape sequences from output as it is received.
+
+    The filter carries its state between calls to :func:`redexpect.terminal.TerminalFilter.feed`, so an escape
+    sequence split across two reads is still removed completely. Handled are CSI sequences (``ESC [``, eg colours and
+    cursor movement), string sequences ending in ``BEL`` or ``ESC \\`` (OSC ``ESC ]`` for window titles and hyperlinks,
+    DCS, SOS, PM and APC) and the other two or three character escapes (eg ``ESC ( B`` or ``ESC =``).
+    Complete escape sequences are removed with a single regex substitution over the whole piece of output, only a
+    sequence left incomplete at the end of it goes through the state machine that carries over to the next piece.
+    '''
+    def __init__(self):
+        self.state = STATE_TEXT
+
+    def reset(self):
+        '''
+        Forget any escape sequence that is partway through being received.
+        '''
+        self.state = STATE_TEXT
+
+    def feed(self,data,strip_ansi=True):
+        '''
+        Clean the next piece of output.
+
+        :param data: Output from the remote session.
+        :type data: ``str`` or ``bytes``
+        :param strip_ansi: Set to ``False`` to only remove carriage returns.
+        :type strip_ansi: ``bool``
+        :returns: ``str`` or ``bytes`` - ``data`` without carriage returns and escape sequences.
+        '''
+        syntax = SYNTAX
+        if isinstance(data,bytes):
+            syntax = SYNTAX_BYTES
+        if strip_ansi==False:
+            self.state = STATE_TEXT
+            return(data.replace(syntax.cr,syntax.empty))
+
+        data = data.replace(syntax.cr,syntax.empty)
+        pos = 0
+        if self.state!=STATE_TEXT:
+            pos = self._advance(syntax,data,0)
+        cleaned = syntax.escape_sequence.sub(syntax.empty,data[pos:])
+        incomplete = cleaned.find(syntax.escape)
+        if incomplete!=-1:
+            self._advance(syntax,cleaned,incomplete)
+            cleaned = cleaned[:incomplete]
+        return(cleaned)
+
+    def _advance(self,syntax,data,pos):
+        # Step through an escape sequence until it ends or the data runs out.
+        length = len(data)
+        state = self.state
+        if state==STATE_TEXT:
+            state = STATE_ESCAPE
+            pos += 1
+        while pos<length and state!=STATE_TEXT:
+            if state==STATE_ESCAPE:
+                char = data[pos:pos+1]
+                pos += 1
+                if char==syntax.csi:
+                    state = STATE_CSI
+                elif char in syntax.string_start:
+                    state = STATE_STRING
+                elif syntax.between(char,0x20,0x2f):
+                    state = STATE_ESCAPE_INTERMEDIATE
+                else:
+                    state = STATE_TEXT
+            elif state==STATE_ESCAPE_INTERMEDIATE:
+                char = data[pos:pos+1]
+                pos += 1
+                if not syntax.between(char,0x20,0x2f):
+                    state = STATE_TEXT
+            elif state==STATE_CSI:
+                pos = syntax.csi_body.match(data,pos).end()
+                if pos<length:
+                    if syntax.between(data[pos:pos+1],0x40,0x7e):
+                        pos += 1
+                    state = STATE_TEXT
+            elif state==STATE_STRING:
+                match = syntax.string_end.search(data,pos)
+                if match==None:
+                    pos = length
+                else:
+                    pos = match.end()
+                    if data[match.start():pos]!=syntax.bel:
+                        state = STATE_STRING_ESCAPE
+                    else:
+                        state = STATE_TEXT
+            elif state==STATE_STRING_ESCAPE:
+                if data[pos:pos+1]==syntax.string_terminator:
+                    pos += 1
+                    state = STATE_TEXT
+                else:
+                    state = STATE_ESCAPE
+        self.state = state
+        return(pos)
@@ -0,0 +1,275 @@
+# RedExpect
+# Copyright (C) 2018 - 2020  Red_M ( http://bitbucket.com/Red_M )
+
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+
+import os
+import pty
+import time
+import errno
+import fcntl
+import select
+import struct
+import termios
+import subprocess
+import collections
+
+from redexpect import recording
+from redexpect import session
+
+
+class Transport(object):
+    '''
+    Something that carries a terminal session, for use with :class:`redexpect.transports.TransportSession`.
+    Subclasses must provide :func:`redexpect.transports.Transport.read_nowait`, :func:`redexpect.transports.Transport.send`
+    and either :func:`redexpect.transports.Transport.fileno` or their own :func:`redexpect.transports.Transport.wait`.
+    '''
+
+    def read_nowait(self):
+        '''
+        Read everything received so far without waiting for more.
+
+        :returns: ``array`` of ``bytes``, with ``None`` as the last item if the remote end has closed.
+        '''
+        raise(NotImplementedError())
+
+    def send(self,data):
+        '''
+        Send data to the remote end.
+
+        :param data: Data to send.
+        :type data: ``bytes``
+        :returns: ``int`` - Amount of bytes sent.
+        '''
+        raise(NotImplementedError())
+
+    def fileno(self):
+        '''
+        :returns: ``int`` - File descriptor that is readable when there is data to read, ``None`` if there isn't one.
+        '''
+        return(None)
+
+    def wait(self,timeout):
+        '''
+        Sleep until there is data to read or ``timeout`` seconds pass.
+
+        :param timeout: Longest time in seconds to sleep for.
+        :type timeout: ``float``
+        '''
+        if self.fileno()==None:
+            time.sleep(self.wait_time(timeout))
+        else:
+            select.select([self.fileno()],[],[],timeout)
+
+    def wait_time(self,timeout):
+        '''
+        How long to sleep for when waiting on a transport that has no file descriptor.
+
+        :param timeout: Longest time in seconds to sleep for.
+        :type timeout: ``float``
+        :returns: ``float``
+        '''
+        return(timeout)
+
+    def close(self):
+        '''
+        Close the transport.
+        '''
+        pass
+
+
+class PtyTransport(Transport):
+    '''
+    Runs a local program in a new pseudo terminal, eg a shell, a serial console client or ``telnet``.
+
+    :param argv: Program and its arguments.
+    :type argv: ``array`` of ``str``
+    :param env: Environment for the program, ``None`` to use the current one.
+    :type env: ``dict``
+    :param cwd: Directory to run the program in.
+    :type cwd: ``str``
+    :param dimensions: ``tuple (int, int)`` of the terminal's rows and columns.
+    :type dimensions: ``tuple``
+    '''
+    def __init__(self,argv,env=None,cwd=None,dimensions=(24,80)):
+        (self.master,slave) = pty.openpty()
+        fcntl.ioctl(slave,termios.TIOCSWINSZ,struct.pack('HHHH',dimensions[0],dimensions[1],0,0))
+        def controlling_terminal():
+            os.setsid()
+            fcntl.ioctl(0,termios.TIOCSCTTY,0)
+        try:
+            self.process = subprocess.Popen(argv,stdin=slave,stdout=slave,stderr=slave,env=env,cwd=cwd,preexec_fn=controlling_terminal)
+        finally:
+            os.close(slave)
+        os.set_blocking(self.master,False)
+        self.closed = False
+
+    def fileno(self):
+        return(self.master)
+
+    def read_nowait(self):
+        received = []
+        while self.closed==False:
+            try:
+                data = os.read(self.master,65536)
+            except BlockingIOError:
+                break
+            except OSError as e:
+                # Linux raises EIO once the program has exited and closed its side.
+                if e.errno!=errno.EIO:
+                    raise
+                data = b''
+            if len(data)==0:
+                received.append(None)
+                break
+            received.append(data)
+        return(received)
+
+    def send(self,data):
+        total_written = 0
+        while total_written<len(data):
+            try:
+                total_written += os.write(self.master,data[total_written:])
+            except BlockingIOError:
+                select.select([],[self.master],[])
+        return(total_written)
+
+    def close(self):
+        if self.closed==False:
+            self.closed = True
+            os.close(self.master)
+            if self.process.poll()==None:
+                self.process.terminate()
+            self.process.wait()
+
+
+class ReplayTransport(Transport):
+    '''
+    Plays back a recording made with :func:`redexpect.session.ExpectSession.record`, to run a session against
+    recorded output without the remote end, eg for tests and benchmarks.
+
+    Output recorded after something was sent is held back until the session has sent as many bytes again, so the
+    replay follows the session the same way the remote end did. What the session sends is kept in
+    :var:`redexpect.transports.ReplayTransport.sent` but is otherwise not checked against the recording.
+
+    :param recording: The recording, see :func:`redexpect.recording.load_recording`.
+    :type recording: ``array`` of ``tuple (float, str, bytes)``
+    :param speed: ``None`` to play back as fast as possible, ``1.0`` to keep the recorded timing, ``2.0`` for twice as fast and so on.
+    :type speed: ``float``
+    :param eof: Set to ``False`` to keep the transport open once the recording has been played back, instead of closing it.
+    :type eof: ``bool``
+    '''
+    def __init__(self,recording,speed=None,eof=True):
+        self.recording = recording
+        self.speed = speed
+        self.eof = eof
+        self.position = 0
+        self.sent = []
+        self.sent_bytes = 0
+        self.recorded_sent_bytes = 0
+        self.mark_time = 0.0
+        self.mark_played = time.monotonic()
+
+    def _next(self,now):
+        # Returns the next chunk of received data that is due, passing any recorded sends the session has caught up with.
+        while self.position<len(self.recording):
+            (entry_time,direction,data) = self.recording[self.position]
+            if direction==recording.SENT:
+                if self.sent_bytes<self.recorded_sent_bytes+len(data):
+                    return(None)
+                self.recorded_sent_bytes += len(data)
+                (self.mark_time,self.mark_played) = (entry_time,now)
+                self.position += 1
+                continue
+            if self.speed!=None and self._due(entry_time)>now:
+                return(None)
+            self.position += 1
+            return(data)
+        return(None)
+
+    def _due(self,entry_time):
+        return(self.mark_played+((entry_time-self.mark_time)/self.speed))
+
+    @property
+    def finished(self):
+        '''
+        :returns: ``bool`` - ``True`` once all of the recording has been played back.
+        '''
+        return(self.position>=len(self.recording))
+
+    def read_nowait(self):
+        received = []
+        now = time.monotonic()
+        data = self._next(now)
+        while data!=None:
+            received.append(data)
+            data = self._next(now)
+        if self.finished==True and self.eof==True:
+            received.append(None)
+        return(received)
+
+    def send(self,data):
+        self.sent.append(data)
+        self.sent_bytes += len(data)
+        return(len(data))
+
+    def wait_time(self,timeout):
+        if self.finished==False and self.speed!=None:
+            (entry_time,direction,data) = self.recording[self.position]
+            if direction==recording.RECEIVED:
+                timeout = min(timeout,max(0,self._due(entry_time)-time.monotonic()))
+        return(timeout)
+
+
+class TransportSession(session.ExpectSession):
+    '''
+    An expect session over any :class:`redexpect.transports.Transport`, with the same functions as :class:`redexpect.RedExpect`.
+    Call :func:`redexpect.session.ExpectSession.start` once the transport is at its first prompt, instead of :func:`redexpect.RedExpect.login`.
+
+    :param transport: Transport to run the session over.
+    :type transport: :class:`redexpect.transports.Transport`
+
+    The rest of the arguments are the same as for :class:`redexpect.RedExpect`.
+    '''
+    def __init__(self,transport,**kwargs):
+        super().__init__(**kwargs)
+        self.transport = transport
+        self.pending = collections.deque()
+
+    def read(self):
+        # A transport can hand over several chunks at once, they are passed on one at a time so the ones after a match
+        # stay here for the next expect instead of being lost when it stops reading.
+        if len(self.pending)==0:
+            self.pending.extend(self.transport.read_nowait())
+        while len(self.pending)>0:
+            data = self.pending.popleft()
+            if data!=None:
+                self.out_feed(data)
+            yield(data)
+
+    def send(self,string):
+        if isinstance(string,str):
+            string = string.encode(self.encoding)
+        return(self.transport.send(string))
+
+    def wait_for_data(self,timeout):
+        self.transport.wait(timeout)
+
+    def exit(self):
+        '''
+        Close the session's transport.
+        '''
+        self.transport.close()
@@ -68,7 +68,8 @@ setuptools.setup(
     install_requires=deps,
     extras_require={
         'tests':list(set(deps+test_deps)),
-        'docs':list(set(deps+doc_deps))
+        'docs':list(set(deps+doc_deps)),
+        'prometheus':['prometheus_client']
     },
     classifiers=[
         'Development Status :: 5 - Production/Stable',
@@ -25,6 +25,7 @@ import subprocess
 import socket
 import sys
 import threading
+import time
 import cryptography
 import traceback
 
@@ -86,10 +87,30 @@ class Server(StubServer):
     def check_channel_pty_request(self, channel, term, width, height, pixelwidth, pixelheight, modes):
         return(True)
 
+    def check_channel_exec_request(self, channel, command):
+        threading.Thread(target=exec_command,args=(channel,command.decode('utf8'))).start()
+        return(True)
+
+def exec_command(channel, command):
+    time.sleep(0.05)
+    if command=='reply':
+        channel.send('PONG!\n')
+        exit_status = 0
+    elif command.startswith('sleep '):
+        time.sleep(float(command[6:]))
+        exit_status = 0
+    else:
+        channel.send_stderr(command+': command not found\n')
+        exit_status = 127
+    channel.send_exit_status(exit_status)
+    channel.shutdown_write()
+    channel.close()
+
 class Commands(object):
     def __init__(self, chan):
         global server_port,server_prompt
         self.chan = chan
+        self.f = chan.makefile('rU')
         self.server_prompt = server_prompt
 
     def send(self, line):
@@ -104,8 +125,7 @@ class Commands(object):
 
     def cmd_sudo(self):
         self.chan.send('[sudo] password for lowly_pleb: ')
-        f = self.chan.makefile('rU')
-        received_passwd = f.readline().strip('\r\n')
+        received_passwd = self.f.readline().strip('\r\n')
         self.send('')
         if received_passwd=='bar':
             self.server_prompt = '#'
@@ -132,6 +152,7 @@ def start_server(queue):
         sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
         sock.bind(('', server_port))
+        sock.listen(100)
         queue.put(sock.getsockname()[1])
     except Exception as e:
         print('*** Bind failed: ' + str(e))
@@ -139,7 +160,6 @@ def start_server(queue):
         sys.exit(1)
 
     try:
-        sock.listen(100)
         print('Listening for connection ...')
         client, addr = sock.accept()
     except Exception as e:
@@ -184,11 +204,13 @@ def start_server(queue):
         command = ''
         while not command=='cmd_exit':
             chan.send(line_endings+'Command'+server_prompt+' ')
-            f = chan.makefile('rU')
-            command = 'cmd_'+f.readline().strip('\r\n').replace(' ','_')
+            line = commands.f.readline().strip('\r\n')
+            command = 'cmd_'+line.replace(' ','_')
             print('Got: '+command)
             # chan.send(line_endings)
-            if command in dir(commands):
+            if line.startswith('echo '):
+                commands.send(line[5:].replace('$?','0'))
+            elif command in dir(commands):
                 func = getattr(commands,command)
                 func()
 
@@ -1,4 +1,6 @@
+import time
 import unittest
+import asyncio
 import threading
 import multiprocessing
 import paramiko
@@ -52,6 +54,75 @@ class RedExpectUnitTest(unittest.TestCase):
         result = sshs.rs.command('reply',remove_newline=True)
         assert result=='PONG!'
 
+    def test_command_batch(self):
+        sshs = self.start_ssh_session()
+        results = sshs.rs.command_batch(['reply','whoami'])
+        assert [(exit_status,out.strip()) for (exit_status,out) in results]==[(0,'PONG!'),(0,'lowly_pleb')]
+        result = sshs.rs.command('reply',remove_newline=True)
+        assert result=='PONG!'
+
+    def test_exec_commands(self):
+        sshs = self.start_ssh_session()
+        started = time.monotonic()
+        results = sshs.rs.exec_commands(['sleep 0.5','reply','nope','sleep 0.5'])
+        assert time.monotonic()-started<1.0
+        assert [(result.exit_status,result.stdout,result.stderr) for result in results[1:3]]==[(0,'PONG!\n',''),(127,'','nope: command not found\n')]
+        assert results[0].exit_status==0
+        assert sshs.rs.exec_command('reply').stdout=='PONG!\n'
+        assert sshs.rs.command('reply',remove_newline=True)=='PONG!'
+
+    def test_session_pool(self):
+        server_port = self.start_ssh_server()
+        pool = redexpect.SessionPool(session_kwargs={'expect_timeout':1.5},login_kwargs={'username':'redm','password':'foobar!'},probe_timeout=1.5)
+        with pool.session('localhost',port=server_port) as session:
+            assert session.command('reply',remove_newline=True)=='PONG!'
+        assert len(pool)==1
+        fleet = redexpect.Fleet([{'hostname':'localhost','port':server_port}],pool=pool)
+        results = list(fleet.command('whoami',remove_newline=True))
+        assert [host_result.result for host_result in results]==['lowly_pleb']
+        assert (pool.logins,pool.reused)==(1,1)
+        with pool.session('localhost',port=server_port) as session:
+            session.sendline('exit')
+            session.expect('END OF TEST')
+        assert len(pool)==1
+        with self.assertRaises(Exception):
+            pool.acquire('localhost',port=server_port)
+        assert len(pool)==0
+        assert pool.close_idle()==0
+
+    def test_fleet(self):
+        hosts = [{'hostname':'localhost','port':self.start_ssh_server()} for _ in range(3)]
+        hosts.append({'hostname':'localhost','port':self.start_ssh_server(),'password':'wrong'})
+        fleet = redexpect.Fleet(hosts,max_workers=2,host_timeout=10,session_kwargs={'expect_timeout':1.5},login_kwargs={'username':'redm','password':'foobar!'})
+        results = list(fleet.command('reply',remove_newline=True))
+        assert sorted([host_result.result for host_result in results if host_result.ok])==['PONG!']*3
+        assert fleet.stats.succeeded==3
+        assert fleet.stats.failed==1
+        assert fleet.stats.latency(100)>=fleet.stats.latency(0)
+
+    def test_async_command(self):
+        server_ports = [self.start_ssh_server() for _ in range(2)]
+        async def run(server_port):
+            session = redexpect.AsyncRedExpect(expect_timeout=1.5)
+            await session.login('localhost',server_port,'redm','foobar!')
+            try:
+                reply = await session.command('reply',remove_newline=True)
+                batch = await session.command_batch(['reply','whoami'])
+                await session.sudo('bar',sudo=False,su_cmd='sudo')
+                whoami = await session.command('whoami',remove_newline=True)
+                assert (await session.exec_command('reply')).stdout=='PONG!\n'
+                return((reply,[(exit_status,out.strip()) for (exit_status,out) in batch],whoami))
+            finally:
+                session.exit()
+        async def run_all():
+            return(await asyncio.gather(*[run(server_port) for server_port in server_ports]))
+        loop = asyncio.new_event_loop()
+        try:
+            results = loop.run_until_complete(run_all())
+        finally:
+            loop.close()
+        assert results==[('PONG!',[(0,'PONG!'),(0,'lowly_pleb')],'root')]*2
+
     def test_set_prompt(self):
         sshs = self.start_ssh_session()
         sshs.rs.set_unique_prompt(True,True)
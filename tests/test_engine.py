@@ -0,0 +1,29 @@
+import unittest
+from redexpect import engine
+
+
+class ExpectEngineUnitTest(unittest.TestCase):
+
+    def test_match_event(self):
+        expect_engine = engine.ExpectEngine()
+        pattern_set = expect_engine.compile([r'nope',r'Command\$ '])
+        assert expect_engine.begin(pattern_set)==None
+        assert expect_engine.feed(b'\x1b[1mout\x1b[0mput\r\nComm')==None
+        found = expect_engine.feed(b'and$ left over')
+        assert (found.index,found.re_string)==(1,r'Command\$ ')
+        assert (found.before,found.after)==('output\n','Command$ ')
+        assert expect_engine.buffer=='left over'
+
+    def test_buffers_after_match(self):
+        expect_engine = engine.ExpectEngine(bytes_mode=True)
+        assert expect_engine.begin(expect_engine.compile(r'\$ '))==None
+        assert expect_engine.feed(b'one$ ').output==b'one$ '
+        assert expect_engine.feed(b'two$ ')==None
+        assert expect_engine.begin(expect_engine.compile(r'\$ ')).before==b'two'
+        expect_engine.feed(b'three')
+        expect_engine.reset()
+        assert expect_engine.buffer==b''
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -9,6 +9,13 @@ class RedExpectUnitTest(unittest.TestCase):
     def test_expect_timeout(self):
         redexpect.exceptions.ExpectTimeout(None)
 
+    def test_command_failed(self):
+        failed = redexpect.exceptions.CommandFailed('false',redexpect.CommandResult('',0,None,0,'',exit_status=1))
+        assert failed.exit_status==1
+
+    def test_channel_read_error(self):
+        redexpect.exceptions.ChannelReadError('uname',-26)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,246 @@
+import os
+import re
+import tempfile
+import unittest
+import redexpect
+from redssh import libssh2
+from ssh2 import error_codes
+
+
+class FeedExpect(redexpect.RedExpect):
+    '''
+    RedExpect that reads from a list of chunks instead of an SSH session.
+    '''
+    def __init__(self,chunks,**kwargs):
+        kwargs.update({'expect_timeout':0.5,'expect_wait_interval':0})
+        super().__init__(**kwargs)
+        self.chunks = list(chunks)
+        self.sent = []
+
+    def read(self,block=False):
+        while len(self.chunks)>0:
+            yield(self.chunks.pop(0))
+
+    def sendline_raw(self,string):
+        self.sent.append(string)
+
+
+class ClosedChannel(object):
+    '''
+    Exec channel whose reads fail the way libssh2's do once the channel or connection is gone.
+    '''
+    def execute(self,cmd):
+        return(0)
+
+    def read(self,size):
+        return((error_codes.LIBSSH2_ERROR_CHANNEL_CLOSED,b''))
+
+    def read_stderr(self,size):
+        return((libssh2.LIBSSH2_ERROR_EAGAIN,b''))
+
+    def eof(self):
+        return(False)
+
+
+class ClosedChannelSession(object):
+    def open_session(self):
+        return(ClosedChannel())
+
+
+class RedExpectFeedUnitTest(unittest.TestCase):
+
+    def test_split_multibyte(self):
+        data = 'café ☃\r\nCommand$ '.encode('utf8')
+        rs = FeedExpect([data[:4],data[4:8],data[8:]])
+        assert rs.expect(r'Command\$ ')==0
+        assert rs.current_output=='café ☃\nCommand$ '
+
+    def test_split_utf16(self):
+        data = 'réponse\r\nCommand$ '.encode('utf16')
+        rs = FeedExpect([data[:3],data[3:9],data[9:]],encoding='utf16')
+        assert rs.expect(r'Command\$ ')==0
+        assert rs.current_output=='réponse\nCommand$ '
+
+    def test_bytes_mode(self):
+        rs = FeedExpect([b'show version\r\n',b'Version 1.0\r\nswitch01# '],bytes_mode=True)
+        rs.prompt_regex = r'switch01\# '
+        assert rs.command('show version',remove_newline=True)==b'Version 1.0'
+        assert rs.sent==['show version\r']
+
+    def test_bytes_mode_prompt_cache(self):
+        cache_path = os.path.join(tempfile.mkdtemp(),'prompts.json')
+        prompt = 'café# '.encode('utf8')
+        rs = FeedExpect([prompt,b'\r\n'+prompt],bytes_mode=True,prompt_cache=cache_path)
+        rs.prompt_cache_key = ('switch01',)
+        rs.start()
+        assert rs.prompt_regex==re.escape(prompt)
+        rs = FeedExpect([prompt],bytes_mode=True,prompt_cache=cache_path)
+        rs.prompt_cache_key = ('switch01',)
+        rs.start()
+        assert rs.sent==[]
+        assert rs.prompt_regex==re.escape(prompt).decode('latin-1')
+
+    def test_keeps_output_after_match(self):
+        rs = FeedExpect([b'one\r\nCommand$ two\r\nCommand$ '])
+        rs.prompt_regex = r'Command\$ '
+        assert rs.prompt()==0
+        assert rs.before=='one\n'
+        assert rs.after=='Command$ '
+        assert rs.buffer=='two\nCommand$ '
+        assert rs.prompt()==0
+        assert rs.current_output_clean=='two\n'
+        assert rs.buffer==''
+
+    def test_command_result(self):
+        rs = FeedExpect([b'uname\r\nLinux\r\nCommand$ '])
+        rs.prompt_regex = r'Command\$ '
+        result = rs.command('uname',result=True)
+        assert isinstance(result,redexpect.CommandResult)
+        assert result.index==0
+        assert result.output=='uname\nLinux\nCommand$ '
+        assert result.before=='uname\nLinux\n'
+        assert result.after=='Command$ '
+        assert result.span==(12,21)
+        assert result._clean==None
+        assert result.clean=='Linux\n'
+        assert result.clean is result.clean
+        assert result.duration>=0
+        assert rs.last_result is result
+        assert rs.current_output_clean=='Linux\n'
+        try:
+            result.extra = True
+            assert False
+        except AttributeError:
+            pass
+
+    def test_command_pager(self):
+        erase = b'\x08'*10+b' '*10+b'\x08'*10
+        rs = FeedExpect([b'show run\r\nline1\r\n --More-- ',erase+b'line2\r\n --More-- ',erase+b'line3\r\nswitch# '])
+        rs.prompt_regex = r'switch\# '
+        assert rs.command('show run',pager=True)=='line1\nline2\nline3\n'
+        assert rs.sent==['show run\r',' ',' ']
+        assert rs.current_output=='show run\nline1\nline2\nline3\nswitch# '
+        assert rs.after=='switch# '
+
+    def test_disable_paging(self):
+        rs = FeedExpect([b'terminal length 0\r\nbash: terminal: command not found\r\nCommand$ ',b'stty rows 0\r\nCommand$ '])
+        rs.prompt_regex = r'Command\$ '
+        assert rs.disable_paging()=='stty rows 0'
+        assert rs.sent==['terminal length 0\r','stty rows 0\r']
+
+    def test_disable_echo_fallback(self):
+        rs = FeedExpect([b'stty -echo\r\n% Invalid input\r\nswitch# '])
+        rs.prompt_regex = r'switch\# '
+        rs._echo_check = lambda: '# check'
+        rs.chunks.append(b'# check\r\nswitch# ')
+        assert rs.disable_echo()==False
+        assert rs.remote_echo==True
+
+    def test_command_stream(self):
+        rs = FeedExpect([b'cmd\r\nline1\r\nli',b'ne2\r\npar',b'tial\r\nCommand$ '])
+        rs.prompt_regex = r'Command\$ '
+        assert list(rs.command_stream('cmd'))==['line1\n','line2\n','partial\n']
+        assert rs.after=='Command$ '
+        rs = FeedExpect([b'cmd\r\nline1\r\nli',b'ne2\r\npar',b'tial\r\nCommand$ '])
+        rs.prompt_regex = r'Command\$ '
+        assert list(rs.command_stream('cmd',lines=True))==['line1\n','line2\n','partial\n']
+
+    def test_command_stream_bounded(self):
+        line = b'x'*100+b'\r\n'
+        rs = FeedExpect([line*100 for _ in range(100)]+[b'Command$ '],expect_lookbehind=256)
+        rs.prompt_regex = r'Command\$ '
+        total = 0
+        for chunk in rs.command_stream('cmd'):
+            assert len(rs.buffer)<=len(line)*100
+            total += len(chunk)
+        assert total==101*100*100
+
+    def test_command_spool(self):
+        line = b'y'*99+b'\r\n'
+        rs = FeedExpect([b'cmd\r\n']+[line*100 for _ in range(20)]+[b'Command$ '])
+        rs.prompt_regex = r'Command\$ '
+        spooled = rs.command('cmd',spool=4096)
+        assert spooled.spilled==True
+        assert len(spooled)==20*100*100
+        assert len(re.findall(rb'y+\n',spooled.view()))==20*100
+        assert spooled.view()[:4]==b'yyyy'
+        spooled.close()
+
+    def test_expect_spool(self):
+        rs = FeedExpect([b'one\r\ntwo\r\nthr',b'ee Command$ rest'])
+        assert rs.expect(r'Command\$ ',spool=True)==0
+        assert rs.spooled.spilled==False
+        assert rs.spooled.text()=='one\ntwo\nthree '
+        assert rs.buffer=='rest'
+
+    def test_current_output_assignable(self):
+        rs = FeedExpect([b'uname\r\nLinux\r\nCommand$ '])
+        rs.current_output_clean = 'nothing yet'
+        assert rs.current_output=='' and rs.current_output_clean=='nothing yet'
+        rs.prompt_regex = r'Command\$ '
+        result = rs.command('uname',result=True)
+        rs.current_output_clean = 'Linux'
+        assert rs.current_output_clean=='Linux'
+        assert rs.after=='Command$ '
+        assert result.clean=='Linux\n'
+        rs.current_output = 'replaced'
+        assert rs.current_output=='replaced' and rs.current_output_clean=='replaced'
+        assert rs.before=='replaced' and rs.after=='' and rs.match==None
+
+    def test_spool_false(self):
+        rs = FeedExpect([b'cmd\r\nout\r\nCommand$ '])
+        rs.prompt_regex = r'Command\$ '
+        assert rs.command('cmd',spool=False)=='out\n'
+        rs = FeedExpect([b'one\r\nCommand$ '])
+        assert rs.expect(r'Command\$ ',spool=False)==0
+        assert rs.before=='one\n'
+        assert rs.spooled==None
+
+    def test_spool_to_disk(self):
+        rs = FeedExpect([b'cmd\r\nout\r\nCommand$ '])
+        rs.prompt_regex = r'Command\$ '
+        spooled = rs.command('cmd',spool=0)
+        assert spooled.spilled==True
+        # Asking a SpooledTemporaryFile for its fileno moves it to disk, so check it's already there first.
+        assert getattr(spooled.fileobj,'_rolled',True)==True
+        spooled.fileobj.flush()
+        assert os.fstat(spooled.fileobj.fileno()).st_size==len(spooled)==4
+        assert spooled.text()=='out\n'
+        spooled.close()
+        spooled = redexpect.SpooledOutput(threshold=4)
+        spooled.write(b'1234')
+        assert spooled.spilled==False
+        spooled.write(b'5')
+        assert spooled.spilled==True
+        assert getattr(spooled.fileobj,'_rolled',True)==True
+        spooled.fileobj.flush()
+        assert os.fstat(spooled.fileobj.fileno()).st_size==5
+        assert spooled.view()[:]==b'12345'
+        spooled.close()
+
+    def test_spooled_output_encoding(self):
+        spooled = redexpect.SpooledOutput(encoding='utf16')
+        spooled.write('ab')
+        spooled.write('cd')
+        assert spooled.text()=='abcd'
+        spooled.close()
+
+    def test_exec_read_error(self):
+        rs = FeedExpect([])
+        rs.session = ClosedChannelSession()
+        with self.assertRaises(redexpect.exceptions.ChannelReadError) as failed:
+            rs.exec_commands(['uname'],timeout=0)
+        assert failed.exception.cmd=='uname'
+        assert failed.exception.error_code==error_codes.LIBSSH2_ERROR_CHANNEL_CLOSED
+
+    def test_expect_max_buffer(self):
+        rs = FeedExpect([b'y\r\n'*1000 for _ in range(10)]+[b'Command$ '],expect_max_buffer=4096)
+        with self.assertRaises(redexpect.exceptions.BufferOverflow):
+            rs.expect(r'Command\$ ')
+        rs = FeedExpect([b'y\r\n'*1000 for _ in range(10)]+[b'Command$ '],expect_max_buffer=4096,expect_ring_buffer=True)
+        assert rs.expect(r'Command\$ ')==0
+        assert rs.current_output==(('y\n'*2048)+'Command$ ')[-4096:]
+
+
+if __name__ == '__main__':
+    unittest.main()
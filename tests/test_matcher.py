@@ -0,0 +1,121 @@
+import re
+import unittest
+import redexpect
+from redexpect import matcher
+from redexpect import patterns
+
+
+class RedExpectMatcherUnitTest(unittest.TestCase):
+
+    def test_match_split_across_feeds(self):
+        receive_buffer = matcher.StreamMatcher()
+        receive_buffer.begin(patterns.PatternSet(r'Command\$ '))
+        receive_buffer.feed('some output\nComm')
+        assert receive_buffer.search()==None
+        receive_buffer.feed('and$ more')
+        (index,match) = receive_buffer.search()
+        assert index==0
+        assert receive_buffer.span(match)==(len('some output\n'),len('some output\nCommand$ '))
+
+    def test_consume_keeps_remainder(self):
+        receive_buffer = matcher.StreamMatcher()
+        receive_buffer.begin(patterns.PatternSet(r'\$ '))
+        receive_buffer.feed('first$ second$ ')
+        (start,end) = receive_buffer.span(receive_buffer.search()[1])
+        assert receive_buffer.consume(end)=='first$ '
+        receive_buffer.begin(patterns.PatternSet(r'second'))
+        assert receive_buffer.search()[0]==0
+        assert receive_buffer.output()=='second$ '
+
+    def test_pattern_priority(self):
+        receive_buffer = matcher.StreamMatcher()
+        receive_buffer.begin(patterns.PatternSet([r'second',r'first']))
+        receive_buffer.feed('first second')
+        assert receive_buffer.search()[0]==0
+
+    def test_lookbehind_window(self):
+        pattern_set = patterns.PatternSet(r'start.+end')
+        receive_buffer = matcher.StreamMatcher()
+        receive_buffer.begin(pattern_set,lookbehind=8)
+        receive_buffer.feed('start'+('x'*64))
+        assert receive_buffer.search()==None
+        receive_buffer.feed('end')
+        assert receive_buffer.search()==None
+
+        receive_buffer = matcher.StreamMatcher()
+        receive_buffer.begin(pattern_set,lookbehind=8,full_history=True)
+        receive_buffer.feed('start'+('x'*64))
+        assert receive_buffer.search()==None
+        receive_buffer.feed('end')
+        assert receive_buffer.search()[0]==0
+
+    def test_ring_buffer(self):
+        receive_buffer = matcher.StreamMatcher(max_size=16,ring=True)
+        receive_buffer.begin(patterns.PatternSet(r'Comm\w+\$ '))
+        for _ in range(100):
+            receive_buffer.feed('y\n'*5)
+            assert receive_buffer.search()==None
+            assert len(receive_buffer)<=16
+        receive_buffer.feed('Comm')
+        receive_buffer.feed('and$ ')
+        (start,end) = receive_buffer.span(receive_buffer.search()[1])
+        assert receive_buffer.consume(end)=='\ny\ny\ny\nCommand$ '
+        assert receive_buffer.discarded==(100*10)+9-16
+
+    def test_buffer_overflow(self):
+        receive_buffer = matcher.StreamMatcher(max_size=16)
+        receive_buffer.begin(patterns.PatternSet(r'\$ '))
+        receive_buffer.feed('y\n'*8)
+        with self.assertRaises(redexpect.exceptions.BufferOverflow):
+            receive_buffer.feed('y\n')
+        assert receive_buffer.output()=='y\n'*8
+
+    def test_pattern_set_cache(self):
+        pattern_set = patterns.compile_patterns([r'\$ ',r'\# '],prefix='Command')
+        assert patterns.compile_patterns([r'\$ ',r'\# '],prefix='Command') is pattern_set
+        assert patterns.compile_patterns(pattern_set) is pattern_set
+        assert pattern_set.combined!=None
+        assert pattern_set.search('MOTD\nCommand# ')[0]==1
+        assert pattern_set.search('MOTD\nCommand% ')==None
+
+    def test_pattern_set_uncombinable(self):
+        pattern_set = patterns.PatternSet([r'(a)\1',r'(b)\1'])
+        assert pattern_set.combined==None
+        assert pattern_set.search('xbb')[0]==1
+
+    def test_required_literal(self):
+        assert patterns.required_literal(r'% Invalid input.*')=='% Invalid input'
+        assert patterns.required_literal(r'(abc)?x')=='x'
+        assert patterns.required_literal(r'.+?[\#\$]\s+')==None
+        assert patterns.required_literal(r'(?i)more')==None
+        assert patterns.required_literal(b'--More--')==b'--More--'
+
+    def test_required_literal_parsed_flags(self):
+        # Python 3.7 and older keep inline flags on parsed.pattern instead of parsed.state.
+        class OldState(object):
+            flags = re.IGNORECASE
+        class OldSubPattern(object):
+            pattern = OldState()
+        assert patterns._parsed_flags(OldSubPattern())==re.IGNORECASE
+        assert patterns._parsed_flags(object())==0
+        pattern_set = patterns.PatternSet([r'% Invalid input.*',r'(?i)--more--'])
+        assert pattern_set.search('--MORE--')[0]==1
+        assert pattern_set.search('% Invalid input detected')[0]==0
+
+    def test_pattern_set_prefilter(self):
+        pattern_set = patterns.PatternSet([r'% Invalid input.*\n',r'\[confirm\]',r'--More--',r'% Invalid'])
+        assert pattern_set.prefilter!=None
+        assert pattern_set.search('interface eth0\n ip address dhcp\n')==None
+        assert pattern_set.search('Proceed? [confirm]')[0]==1
+        assert pattern_set.search('% Invalid command')[0]==3
+        assert pattern_set.search('% Invalid input detected\n% Invalid')[0]==0
+        assert pattern_set.search('[confirm]',pos=1)==None
+        pattern_set = patterns.PatternSet([r'--More--',r'.+?[\#\$]\s+'])
+        assert pattern_set.prefilter==None
+        assert pattern_set.search('user@host$ ')[0]==1
+        pattern_set = patterns.PatternSet([b'--More--',b'\\[confirm\\]'],binary=True)
+        assert pattern_set.search(b'line\n--More--')[0]==0
+
+
+if __name__ == '__main__':
+    unittest.main()
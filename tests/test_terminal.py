@@ -0,0 +1,40 @@
+import unittest
+from redexpect import terminal
+
+
+class RedExpectTerminalUnitTest(unittest.TestCase):
+
+    def feed_split(self,data):
+        out = []
+        for split in range(len(data)+1):
+            terminal_filter = terminal.TerminalFilter()
+            out.append(terminal_filter.feed(data[:split])+terminal_filter.feed(data[split:]))
+        return(out)
+
+    def test_csi(self):
+        data = '\x1b[01;34mdir\x1b[0m\r\n\x1b[?2004hCommand$ '
+        for out in self.feed_split(data):
+            assert out=='dir\nCommand$ '
+
+    def test_osc(self):
+        data = '\x1b]0;user@host: ~\x07\x1b]8;;file:///tmp\x1b\\tmp\x1b]8;;\x1b\\\n'
+        for out in self.feed_split(data):
+            assert out=='tmp\n'
+
+    def test_short_escapes(self):
+        data = '\x1b(B\x1b=text\x1b>'
+        for out in self.feed_split(data):
+            assert out=='text'
+
+    def test_bytes(self):
+        data = b'\x1b[1;32m\xe2\x97\x8f\x1b[0m sshd.service\r\n'
+        for out in self.feed_split(data):
+            assert out==b'\xe2\x97\x8f sshd.service\n'
+
+    def test_no_strip_ansi(self):
+        terminal_filter = terminal.TerminalFilter()
+        assert terminal_filter.feed('\x1b[0mok\r\n',strip_ansi=False)=='\x1b[0mok\n'
+
+
+if __name__ == '__main__':
+    unittest.main()
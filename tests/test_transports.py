@@ -0,0 +1,320 @@
+import io
+import os
+import re
+import time
+import socket
+import tempfile
+import threading
+import unittest
+import asyncio
+import redexpect
+
+
+def shell_transport(banner=None):
+    env = dict(os.environ)
+    env.update({'PS1':'local$ ','ENV':'','HISTFILE':'/dev/null'})
+    if banner!=None:
+        # The shell prints the banner itself from its startup file, right before its first prompt.
+        (fd,env['ENV']) = tempfile.mkstemp()
+        os.write(fd,b'printf \''+banner.encode('utf8')+b'\'\n')
+        os.close(fd)
+    return(redexpect.PtyTransport(['/bin/sh'],env=env))
+
+
+class RecordingMetrics(redexpect.Metrics):
+    def __init__(self):
+        self.timings = []
+        self.counts = {}
+
+    def timing(self,name,seconds):
+        self.timings.append((name,seconds))
+
+    def count(self,name,value):
+        self.counts[name] = self.counts.get(name,0)+value
+
+
+class WaitRecordingSession(redexpect.TransportSession):
+    def __init__(self,*args,**kwargs):
+        self.waits = []
+        super().__init__(*args,**kwargs)
+
+    def wait_for_data(self,timeout):
+        self.waits.append((time.monotonic(),timeout))
+        super().wait_for_data(timeout)
+
+
+class TransportUnitTest(unittest.TestCase):
+
+    def test_pty_session(self):
+        rs = redexpect.TransportSession(shell_transport(),prompt=r'local\$ ',expect_timeout=5)
+        try:
+            rs.start()
+            assert rs.command('echo hello',remove_newline=True)=='hello'
+            assert list(rs.command_stream('printf "one\\ntwo\\n"',lines=True))==['one\n','two\n']
+            results = rs.command_batch(['echo one','false'])
+            assert [(exit_status,out.strip()) for (exit_status,out) in results]==[(0,'one'),(1,'')]
+            assert rs.command('echo status',remove_newline=True,capture_status=True)=='status'
+            assert rs.last_result.exit_status==0
+            with self.assertRaises(redexpect.exceptions.CommandFailed) as failed:
+                rs.command('echo failed; false',capture_status=True)
+            assert failed.exception.exit_status==1
+            assert failed.exception.result.clean=='failed\n'
+            assert rs.command('(exit 3)',result=True,capture_status=True).exit_status==3
+            assert rs.command('echo hello',remove_newline=True)=='hello'
+            rs.sendline('exit')
+            assert rs.expect('nevermatches')==-1
+        finally:
+            rs.exit()
+
+    def test_pty_session_no_echo(self):
+        rs = redexpect.TransportSession(shell_transport(),prompt=r'local\$ ',expect_timeout=5)
+        try:
+            rs.start(disable_echo=True)
+            assert rs.remote_echo==False
+            assert rs.command('echo echo hello',clean_output=False)=='echo hello\n'+rs.after
+            assert rs.command('echo echo hello')=='echo hello\n'
+            rs.set_unique_prompt()
+            assert rs.command('echo hello',remove_newline=True)=='hello'
+            assert list(rs.command_stream('printf "one\\ntwo\\n"',lines=True))==['one\n','two\n']
+        finally:
+            rs.exit()
+
+    def test_pty_session_banner(self):
+        rs = redexpect.TransportSession(shell_transport('#### Authorized use only ####\nWelcome\n'),expect_timeout=5)
+        try:
+            rs.start()
+            assert rs.prompt_regex==re.escape('local$ ')
+            assert rs.command('echo hi')=='hi\n'
+        finally:
+            rs.exit()
+
+    def test_prompt_cache(self):
+        cache_path = os.path.join(tempfile.mkdtemp(),'prompts.json')
+        rs = redexpect.TransportSession(shell_transport(),prompt=r'local\$ ',expect_timeout=5,prompt_cache=cache_path)
+        rs.prompt_cache_key = ('localhost',22,'user')
+        try:
+            rs.start()
+            assert rs.prompt_regex==re.escape('local$ ')
+        finally:
+            rs.exit()
+        cache = redexpect.PromptCache(cache_path)
+        assert cache.get(('localhost',22,'user',None))==re.escape('local$ ')
+        rs = redexpect.TransportSession(shell_transport(),prompt=r'local\$ ',expect_timeout=5,prompt_cache=cache)
+        rs.prompt_cache_key = ('localhost',22,'user')
+        rs.get_unique_prompt = None
+        try:
+            rs.start()
+            assert rs.command('echo hello',remove_newline=True)=='hello'
+        finally:
+            rs.exit()
+        cache.put(('localhost',22,'user',None),'other\\$\\ ')
+        rs = redexpect.TransportSession(shell_transport(),prompt=r'local\$ ',expect_timeout=5,prompt_cache=cache)
+        rs.prompt_cache_key = ('localhost',22,'user')
+        try:
+            rs.start()
+            assert rs.prompt_regex==re.escape('local$ ')
+        finally:
+            rs.exit()
+        assert redexpect.PromptCache(cache_path).get(('localhost',22,'user',None))==re.escape('local$ ')
+
+    def test_metrics(self):
+        recorded = RecordingMetrics()
+        rs = redexpect.TransportSession(shell_transport(),prompt=r'local\$ ',expect_timeout=5,metrics=recorded)
+        try:
+            rs.start()
+            assert rs.command('echo hello',remove_newline=True)=='hello'
+        finally:
+            rs.exit()
+        names = [name for (name,seconds) in recorded.timings]
+        for name in ['device_init','prompt_discovery','expect','first_byte']:
+            assert name in names
+        assert all([seconds>=0 for (name,seconds) in recorded.timings])
+        assert recorded.counts['bytes_in']==rs.bytes_in
+        assert recorded.counts['bytes_out']==rs.bytes_out==len('\recho hello\r')
+        assert recorded.counts['chunks_read']==rs.chunks_read
+        assert recorded.counts['regex_searches']>=recorded.counts['chunks_read']
+
+    def test_statsd_metrics(self):
+        server = socket.socket(socket.AF_INET,socket.SOCK_DGRAM)
+        server.bind(('127.0.0.1',0))
+        server.settimeout(5)
+        try:
+            statsd = redexpect.StatsdMetrics(port=server.getsockname()[1],host='127.0.0.1',prefix='test')
+            statsd.timing('expect',0.25)
+            statsd.count('bytes_in',12)
+            assert server.recv(1024)==b'test.expect:250.0|ms'
+            assert server.recv(1024)==b'test.bytes_in:12|c'
+        finally:
+            server.close()
+
+    def test_profile(self):
+        rs = redexpect.TransportSession(shell_transport(),prompt=r'local\$ ',expect_timeout=5,profile=True)
+        try:
+            rs.start()
+            assert rs.command('echo hello',remove_newline=True)=='hello'
+            rs.command_batch(['echo one'])
+            # Nothing can be read while the command sleeps, so expect has to wait on the transport.
+            rs.command('sleep 0.2')
+        finally:
+            rs.exit()
+        totals = rs.profile.totals()
+        for name in ['read','wait','decode','remote_text_clean','search','clean']:
+            assert totals[name]>=0
+        assert totals['wait']>0
+        fleet_profile = redexpect.Profile()
+        fleet_profile.merge(rs.profile)
+        fleet_profile.merge(rs.profile)
+        assert fleet_profile.totals()['search']==rs.profile.totals()['search']*2
+        folded = io.StringIO()
+        fleet_profile.write_folded(folded)
+        lines = folded.getvalue().splitlines()
+        assert 'clean' in [line.split(' ')[0] for line in lines]
+        assert all([re.match(r'^(expect;)?\w+ \d+$',line) for line in lines])
+        rs = redexpect.TransportSession(shell_transport(),profile=fleet_profile)
+        rs.exit()
+        assert rs.profile is fleet_profile
+
+    def test_batched_sink(self):
+        transcript = io.BytesIO()
+        def slow_write(data):
+            time.sleep(0.5)
+            transcript.write(data)
+        sink = redexpect.BatchedSink(slow_write,batch_size=1)
+        rs = redexpect.TransportSession(shell_transport(),prompt=r'local\$ ',expect_timeout=5,out_sink=sink)
+        try:
+            rs.start()
+            started = time.monotonic()
+            assert rs.command('echo hello',remove_newline=True)=='hello'
+            assert rs.command('echo two',remove_newline=True)=='two'
+            assert time.monotonic()-started<0.5
+        finally:
+            rs.exit()
+        sink.close()
+        assert b'hello\r\n' in transcript.getvalue()
+        assert b'two\r\n' in transcript.getvalue()
+        assert sink.dropped==0 and sink.written==rs.bytes_in
+
+    def test_batched_sink_full(self):
+        writing = threading.Event()
+        release = threading.Event()
+        written = []
+        def stalled_write(data):
+            writing.set()
+            release.wait(5)
+            written.append(data)
+        writer = redexpect.SinkWriter(flush_interval=0.01)
+        sink = redexpect.BatchedSink(stalled_write,writer=writer,max_pending=8)
+        sink.feed(b'first')
+        assert writing.wait(5)==True
+        sink.feed(b'12345678')
+        sink.feed(b'dropped')
+        assert sink.dropped==len(b'dropped')
+        release.set()
+        sink.close()
+        writer.stop()
+        assert b''.join(written)==b'first12345678'
+
+        blocking = redexpect.BatchedSink(written.append,writer=writer,max_pending=8,block=True)
+        for _ in range(8):
+            blocking.feed(b'123456')
+        blocking.close()
+        writer.stop()
+        assert blocking.dropped==0
+        assert b''.join(written)==b'first12345678'+(b'123456'*8)
+
+    def test_record_replay(self):
+        record = io.StringIO()
+        rs = redexpect.TransportSession(shell_transport(),prompt=r'local\$ ',expect_timeout=5)
+        try:
+            rs.record(record)
+            rs.start()
+            recorded = [rs.command('echo hello',remove_newline=True),rs.command('echo two',remove_newline=True)]
+        finally:
+            rs.exit()
+        record.seek(0)
+        replay = redexpect.ReplayTransport(redexpect.recording.load_recording(record))
+        rs = redexpect.TransportSession(replay,prompt=r'local\$ ',expect_timeout=5)
+        rs.start()
+        assert [rs.command('echo hello',remove_newline=True),rs.command('echo two',remove_newline=True)]==recorded==['hello','two']
+        assert replay.finished==True
+        assert rs.command_batch(['echo three'])==[]
+
+    def test_chunks_after_match(self):
+        recording = [(0.0,'received',b'one$ '),(0.0,'received',b'two$ '),(0.0,'received',b'three# ')]
+        record = io.StringIO()
+        rs = redexpect.TransportSession(redexpect.ReplayTransport(recording,eof=False),expect_timeout=1)
+        rs.record(record)
+        assert rs.expect(r'one\$ ')==0
+        assert rs.expect(r'two\$ ')==0
+        assert rs.expect(r'three\# ')==0
+        assert [data for (entry_time,direction,data) in redexpect.recording.load_recording(io.StringIO(record.getvalue()))]==[b'one$ ',b'two$ ',b'three# ']
+        rs = redexpect.TransportSession(redexpect.ReplayTransport(recording),expect_timeout=1)
+        assert list(rs.command_stream('',lines=True))==[]
+        assert rs.after=='one$ '
+        assert rs.expect(r'three\# ')==0
+        assert rs.before=='two$ '
+        assert rs.expect('nevermatches')==-1
+
+    def test_idle_expect_sleeps(self):
+        rs = WaitRecordingSession(shell_transport(),prompt=r'local\$ ',expect_timeout=5,expect_wait_interval=0.1)
+        try:
+            rs.start()
+            del rs.waits[:]
+            cpu_started = time.process_time()
+            started = time.monotonic()
+            with self.assertRaises(redexpect.exceptions.ExpectTimeout):
+                rs.expect('nevermatches',timeout=0.55)
+            took = time.monotonic()-started
+            cpu = time.process_time()-cpu_started
+        finally:
+            rs.exit()
+        deadline = started+0.55
+        assert took>=0.55
+        assert 4<=len(rs.waits)<=8
+        assert all([0<timeout<=0.1 for (waited_at,timeout) in rs.waits])
+        assert all([timeout<=deadline-waited_at+0.001 for (waited_at,timeout) in rs.waits])
+        assert rs.waits[-1][1]<0.1
+        assert cpu<took/2
+
+    def test_replay_timing(self):
+        recording = [(0.0,'received',b'first$ '),(0.0,'sent',b'x\r'),(0.3,'received',b'x\r\nsecond$ ')]
+        for (speed,slowest) in [(None,0.2),(1.0,None)]:
+            rs = redexpect.TransportSession(redexpect.ReplayTransport(recording,speed=speed),prompt=r'\w+\$ ',expect_timeout=5,expect_wait_interval=0.01)
+            rs.prompt()
+            started = time.monotonic()
+            assert rs.command('x')==''
+            took = time.monotonic()-started
+            if slowest!=None:
+                assert took<slowest
+            else:
+                assert took>=0.3
+
+    def test_async_pty_session(self):
+        async def run():
+            rs = redexpect.AsyncTransportSession(shell_transport(),prompt=r'local\$ ',expect_timeout=5)
+            try:
+                await rs.start(disable_paging=True)
+                assert rs.prompt_regex==re.escape('local$ ')
+                results = await rs.command_batch(['echo one','false'])
+                assert [(exit_status,out.strip()) for (exit_status,out) in results]==[(0,'one'),(1,'')]
+                assert (await rs.command('(exit 3)',result=True,capture_status=True)).exit_status==3
+                spooled = await rs.command('echo spooled',spool=True)
+                assert spooled.text()=='spooled\n'
+                rs.sendline('echo expected')
+                assert (await rs.expect(r'expected\n',spool=True))==0
+                await rs.prompt()
+                with self.assertRaises(TypeError):
+                    rs.command_stream('echo streamed')
+                assert await rs.disable_echo()==True
+                return(await rs.command('echo hello',remove_newline=True))
+            finally:
+                rs.exit()
+        loop = asyncio.new_event_loop()
+        try:
+            assert loop.run_until_complete(run())=='hello'
+        finally:
+            loop.close()
+
+
+if __name__ == '__main__':
+    unittest.main()